@@ -14,27 +14,95 @@ This is meant to be imported; you do not run this directly.
 """
 
 from pyrekordbox import Rekordbox6Database
-from pyrekordbox.db6.tables import DjmdPlaylist, DjmdCue
-from typing import List, Dict, Optional
-from typing import Dict, Tuple
+from pyrekordbox.db6.tables import DjmdPlaylist, DjmdContent, DjmdSongPlaylist
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+from dataclasses import dataclass
+from typing import Iterable, List, Dict, Optional, TextIO, Tuple
+import numpy as np
+import ctypes
+import io
 import os
 import importlib
 import platform
+import time
+from datetime import datetime
+from functools import lru_cache
+
+# Minimum seconds between database-changed checks in detect_current_song
+REFRESH_TTL = 2.0
+
+# analyze_playlist writes its report to `out` once per this many songs
+REPORT_FLUSH_EVERY = 32
+
+# Rekordbox stores BPM as an integer in hundredths (12900 → 129.00)
+REKORDBOX_BPM_SCALE = 100.0
+
+
+@lru_cache(maxsize=4096)
+def _bpm_to_float(rekordbox_bpm: int) -> float:
+    return rekordbox_bpm / REKORDBOX_BPM_SCALE if rekordbox_bpm else 0.0
+
+
+@dataclass(slots=True)
+class SongRow:
+    """Plain snapshot of a playlist song for monitoring loops."""
+    id: str               # Content.ID
+    track_no: int
+    title: str
+    bpm: float            # Content.BPM already converted
+
+
+def top_two_gap_sum(positions_ms: List[int]) -> Optional[int]:
+    """
+    Sum of the two largest gaps between consecutive cue positions (in any order),
+    or None when there are fewer than two gaps. One sort plus a single pass.
+    """
+    positions = sorted(positions_ms)
+    if len(positions) < 3:
+        return None
+    first = second = -1
+    prev = positions[0]
+    for pos in positions[1:]:
+        d = pos - prev
+        prev = pos
+        if d > first:
+            first, second = d, first
+        elif d > second:
+            second = d
+    return first + second
+
 
 class RekordboxPlaylistAnalyzer:
-    def __init__(self):
+    def __init__(self, refresh_ttl: float = REFRESH_TTL):
         self.db = Rekordbox6Database()
-        self.playlists: Dict[str, DjmdPlaylist] = {
-            pl.Name: pl for pl in self.db.get_playlist()
-        }
+        self.refresh_ttl = refresh_ttl
+        self._db_mtime = self.database_mtime()
+        self._last_refresh = time.monotonic()
+        # Playlist name → DjmdPlaylist (None if missing), looked up on demand;
+        # playlist name → songs sorted by TrackNo (and their SongRows, Content.IDs and BPMs);
+        # cleared by refresh()
+        self._playlist_cache: Dict[str, Optional[DjmdPlaylist]] = {}
+        self._sorted_cache: Dict[str, list] = {}
+        self._rows: Dict[str, List[SongRow]] = {}
+        self._content_ids: Dict[str, List[str]] = {}
+        self._bpms: Dict[str, np.ndarray] = {}
+        # Playlist name → (counts dict last handed out, same counts as an array
+        # in TrackNo order, their total, latest updated_at among the rows read)
+        self._count_state: Dict[str, Tuple[Dict[str, int], np.ndarray, int, Optional[datetime]]] = {}
+
+    # python-vlc module once load_vlc_module() succeeded
+    _vlc_module = None
 
     @staticmethod
     def load_vlc_module():
         """
         Load python-vlc against the VLC install whose bitness matches our Python.
         Provides a clear error if bitness mismatch is likely.
+        The loaded module is cached, so later calls return it immediately.
         """
-        import ctypes
+        if RekordboxPlaylistAnalyzer._vlc_module is not None:
+            return RekordboxPlaylistAnalyzer._vlc_module
         is_64_python = platform.architecture()[0] == "64bit"
         candidates = (
             [r"C:\Program Files\VideoLAN\VLC", r"C:\Program Files (x86)\VideoLAN\VLC"]
@@ -48,38 +116,47 @@ class RekordboxPlaylistAnalyzer:
             if not os.path.isdir(vlc_dir):
                 continue
 
-            # Try to check the architecture of libvlc.dll using Windows API
             libvlc_path = os.path.join(vlc_dir, "libvlc.dll")
-            if os.path.exists(libvlc_path):
-                try:
-                    # Read PE header to determine 32-bit or 64-bit
-                    with open(libvlc_path, 'rb') as f:
-                        f.seek(0x3C)
-                        pe_offset = int.from_bytes(f.read(4), 'little')
-                        f.seek(pe_offset + 4)
-                        machine_type = int.from_bytes(f.read(2), 'little')
-                        if is_64_python and machine_type != 0x8664:
-                            raise RuntimeError(f"VLC at '{vlc_dir}' is 32-bit, but you're using 64-bit Python.")
-                        if not is_64_python and machine_type != 0x14c:
-                            raise RuntimeError(f"VLC at '{vlc_dir}' is 64-bit, but you're using 32-bit Python.")
-                except Exception as e:
-                    latest_error = e
-                    continue
-
-            # 1) register the install directory for DLL resolution
+            if not os.path.exists(libvlc_path):
+                latest_error = FileNotFoundError(f"No libvlc.dll in '{vlc_dir}'")
+                continue
+
+            # Check the architecture of libvlc.dll from its PE header
+            try:
+                with open(libvlc_path, 'rb') as f:
+                    f.seek(0x3C)
+                    pe_offset = int.from_bytes(f.read(4), 'little')
+                    f.seek(pe_offset + 4)
+                    machine_type = int.from_bytes(f.read(2), 'little')
+                    if is_64_python and machine_type != 0x8664:
+                        raise RuntimeError(f"VLC at '{vlc_dir}' is 32-bit, but you're using 64-bit Python.")
+                    if not is_64_python and machine_type != 0x14c:
+                        raise RuntimeError(f"VLC at '{vlc_dir}' is 64-bit, but you're using 32-bit Python.")
+            except Exception as e:
+                latest_error = e
+                continue
+
+            # Register the install directory for DLL resolution and make sure
+            # libvlc.dll actually loads before pointing python-vlc at it:
+            # python-vlc calls sys.exit() if PYTHON_VLC_LIB_PATH can't be loaded
             handle = os.add_dll_directory(vlc_dir)
+            try:
+                ctypes.CDLL(libvlc_path)
+            except OSError as e:
+                latest_error = e
+                handle.close()
+                continue
+
             os.environ["VLC_PLUGIN_PATH"] = os.path.join(vlc_dir, "plugins")
-            orig_cwd = os.getcwd()
-            os.chdir(vlc_dir)
+            os.environ["PYTHON_VLC_LIB_PATH"] = libvlc_path
 
             try:
                 vlc = importlib.import_module("vlc")
+                RekordboxPlaylistAnalyzer._vlc_module = vlc
                 return vlc
             except OSError as e:
                 latest_error = e
                 handle.close()
-            finally:
-                os.chdir(orig_cwd)
 
         msg = (
                 "Could not load libvlc from any of:\n  "
@@ -89,60 +166,248 @@ class RekordboxPlaylistAnalyzer:
             msg += f"\nLatest error: {latest_error}"
         raise FileNotFoundError(msg)
 
+    @staticmethod
+    @lru_cache(maxsize=4)
+    def get_vlc_instance(args: Tuple[str, ...] = ("--vout=opengl",)):
+        """
+        Return the process-wide libVLC instance for these options, creating it on
+        first use so every player in the process shares one set of loaded modules.
+        """
+        return RekordboxPlaylistAnalyzer.load_vlc_module().Instance(*args)
+
     @staticmethod
     def rekordbox_bpm_to_bpm(rekordbox_bpm: int) -> float:
         """Convert Rekordbox’s integer BPM (e.g. 12900) to a float (129.00)."""
-        return rekordbox_bpm / 100.0 if rekordbox_bpm else 0.0
+        return _bpm_to_float(rekordbox_bpm)
+
+    @staticmethod
+    def rekordbox_bpm_to_bpm_array(rekordbox_bpms: Iterable[Optional[int]]) -> np.ndarray:
+        """Vectorized rekordbox_bpm_to_bpm: integer BPMs (None → 0) to a float64 array."""
+        bpms = np.fromiter((bpm or 0 for bpm in rekordbox_bpms), dtype=np.float64)
+        bpms /= REKORDBOX_BPM_SCALE
+        return bpms
+
+    def get_playlist(self, name: str) -> Optional[DjmdPlaylist]:
+        """
+        Return the playlist with the given name, or None if there is none.
+        Only that row is queried; the result is cached until the next refresh().
+        """
+        if name not in self._playlist_cache:
+            self._playlist_cache[name] = self.db.session.execute(
+                select(DjmdPlaylist).where(DjmdPlaylist.Name == name)
+            ).scalars().first()
+        return self._playlist_cache[name]
 
     def get_playlist_songs_by_trackno(self, name: str):
         """
         Return songs sorted by TrackNo;
         raises ValueError if the named playlist doesn’t exist.
+        The sorted list is cached until the next refresh().
         """
-        playlist = self.playlists.get(name)
+        songs = self._sorted_cache.get(name)
+        if songs is not None:
+            return songs
+        playlist = self.get_playlist(name)
         if playlist is None:
             raise ValueError(f"Playlist '{name}' not found.")
-        return sorted(playlist.Songs, key=lambda s: s.TrackNo)
+        songs = self._query_playlist_songs(playlist)
+        self._sorted_cache[name] = songs
+        return songs
+
+    def _query_playlist_songs(self, playlist: DjmdPlaylist, limit: Optional[int] = None) -> list:
+        """
+        Load a playlist's songs (the first `limit` if given) in TrackNo order
+        with Content, Content.Key and Content.Artist joined in and Content.Cues
+        fetched by one extra SELECT ... IN, so walking the songs doesn't lazy-load
+        one row at a time (and song rows aren't repeated once per cue).
+        """
+        content = joinedload(DjmdSongPlaylist.Content)
+        query = (
+            self.db.session.query(DjmdSongPlaylist)
+            .filter(DjmdSongPlaylist.PlaylistID == playlist.ID)
+            .order_by(DjmdSongPlaylist.TrackNo)
+            .options(
+                content.selectinload(DjmdContent.Cues),
+                content.joinedload(DjmdContent.Key),
+                content.joinedload(DjmdContent.Artist),
+            )
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    def _count_playlist_songs(self, playlist: DjmdPlaylist) -> int:
+        return self.db.session.execute(
+            select(func.count())
+            .select_from(DjmdSongPlaylist)
+            .where(DjmdSongPlaylist.PlaylistID == playlist.ID)
+        ).scalar_one()
 
     def init_play_counts(self, playlist: str) -> Dict[int, int]:
         """
         Build initial map: Content.ID → DJPlayCount
         for seeding a monitoring loop.
         """
-        songs = self.get_playlist_songs_by_trackno(playlist)
-        return {song.Content.ID: song.Content.DJPlayCount for song in songs}
+        ids = self._playlist_content_ids(playlist)
+        counts, since = self._fetch_play_counts(ids)
+        self._count_state[playlist] = (
+            counts, self._counts_array(ids, counts), self._counts_total(counts), since
+        )
+        return counts
+
+    @staticmethod
+    def _counts_array(content_ids: List[str], counts: Dict[str, int]) -> np.ndarray:
+        """DJPlayCounts of content_ids as an int64 array (missing/None → 0)."""
+        return np.fromiter(
+            (counts.get(cid) or 0 for cid in content_ids), dtype=np.int64, count=len(content_ids)
+        )
+
+    @staticmethod
+    def _counts_total(counts: Dict[str, int]) -> int:
+        return sum(c or 0 for c in counts.values())
+
+    def get_playlist_rows(self, name: str) -> List[SongRow]:
+        """
+        SongRows of a playlist in TrackNo order (cached until refresh()), so
+        monitoring loops read slotted SongRow fields instead of ORM attributes.
+        """
+        rows = self._rows.get(name)
+        if rows is None:
+            rows = [
+                SongRow(song.Content.ID, song.TrackNo, song.Content.Title,
+                        self.rekordbox_bpm_to_bpm(song.Content.BPM))
+                for song in self.get_playlist_songs_by_trackno(name)
+            ]
+            self._rows[name] = rows
+        return rows
+
+    def _playlist_content_ids(self, name: str) -> List[str]:
+        """Content.IDs of a playlist in TrackNo order (cached until refresh())."""
+        ids = self._content_ids.get(name)
+        if ids is None:
+            ids = [row.id for row in self.get_playlist_rows(name)]
+            self._content_ids[name] = ids
+        return ids
+
+    def get_playlist_bpms(self, name: str) -> np.ndarray:
+        """BPMs of a playlist's songs in TrackNo order as an array (cached until refresh())."""
+        bpms = self._bpms.get(name)
+        if bpms is None:
+            rows = self.get_playlist_rows(name)
+            bpms = np.fromiter((row.bpm for row in rows), dtype=np.float64, count=len(rows))
+            self._bpms[name] = bpms
+        return bpms
+
+    def _fetch_play_counts(
+            self, content_ids: List[str], since: Optional[datetime] = None
+    ) -> Tuple[Dict[str, int], Optional[datetime]]:
+        """
+        Read DJPlayCount for the given Content.IDs in one SELECT and return
+        (counts, latest updated_at). With `since`, only rows updated at or after
+        it are read, since Rekordbox bumps updated_at whenever it counts a play.
+        """
+        query = (
+            select(DjmdContent.ID, DjmdContent.DJPlayCount, DjmdContent.updated_at)
+            .where(DjmdContent.ID.in_(content_ids))
+        )
+        if since is not None:
+            query = query.where(DjmdContent.updated_at >= since)
+        rows = self.db.session.execute(query).all()
+        latest = max((updated for _, _, updated in rows if updated is not None), default=since)
+        return {cid: count for cid, count, _ in rows}, latest
+
+    def _fetch_play_count_total(self, content_ids: List[str]) -> int:
+        """SUM(DJPlayCount) over the given Content.IDs, as a single aggregate row."""
+        return self.db.session.execute(
+            select(func.sum(DjmdContent.DJPlayCount))
+            .where(DjmdContent.ID.in_(content_ids))
+        ).scalar() or 0
+
+    def database_mtime(self) -> float:
+        """Latest mtime of master.db and its WAL file (0.0 if not found)."""
+        path = os.path.join(self.db.db_directory, "master.db")
+        mtimes = [os.path.getmtime(p) for p in (path, path + "-wal") if os.path.exists(p)]
+        return max(mtimes, default=0.0)
 
     def refresh(self):
         self.db = Rekordbox6Database()
-        self.playlists = {
-            pl.Name: pl for pl in self.db.get_playlist()
-        }
+        self._playlist_cache = {}
+        self._sorted_cache = {}
+        self._rows = {}
+        self._content_ids = {}
+        self._bpms = {}
+        self._count_state = {}
+        self._db_mtime = self.database_mtime()
+        self._last_refresh = time.monotonic()
+
+    def refresh_if_changed(self):
+        """
+        refresh() only when refresh_ttl has elapsed since the last check
+        and the database file was modified since the last (re)load.
+        """
+        now = time.monotonic()
+        if now - self._last_refresh < self.refresh_ttl:
+            return
+        self._last_refresh = now
+        if self.database_mtime() != self._db_mtime:
+            self.refresh()
 
     def detect_current_song(
             self,
             playlist: str,
             previous_counts: Dict[int, int],
-            last_known_song: object = None
-    ) -> Tuple[object, Dict[int, int]]:
+            last_known_song: Optional[SongRow] = None
+    ) -> Tuple[SongRow, Dict[int, int]]:
         """
-        Return (current_song, updated_counts).
+        Return (current_song, updated_counts), the song as a SongRow.
         If a DJPlayCount incremented, use that song.
         If none changed:
           - Return last_known_song if available.
           - Else, return the first song in the playlist.
+        Play counts are always re-read; the playlists themselves are only
+        reloaded when the database file changed (see refresh_if_changed).
         """
-        self.refresh()
-        songs = self.get_playlist_songs_by_trackno(playlist)
-        new_counts = {}
-        current = None
-
-        for song in songs:
-            cid = song.Content.ID
-            curr = song.Content.DJPlayCount
-            prev = previous_counts.get(cid, curr)
-            new_counts[cid] = curr
-            if curr > prev:
-                current = song
+        self.refresh_if_changed()
+        songs = self.get_playlist_rows(playlist)
+        ids = self._playlist_content_ids(playlist)
+        state = self._count_state.get(playlist)
+        if state is not None and state[0] is not previous_counts:
+            state = None
+
+        # Play counts only go up, so an unchanged total means nothing was played
+        # since the last check: skip reading and comparing every count.
+        total = self._fetch_play_count_total(ids) if state is not None else None
+        if state is not None and total == state[2]:
+            return last_known_song or songs[0], previous_counts
+
+        new_counts = None
+        if state is not None and state[3] is not None:
+            # Only rows touched since the last read should hold a new play count;
+            # if they don't account for the new total, updated_at wasn't bumped
+            # for some play, so read every count instead
+            changed_counts, since = self._fetch_play_counts(ids, since=state[3])
+            new_counts = {**previous_counts, **changed_counts}
+            if self._counts_total(new_counts) != total:
+                new_counts = None
+        if new_counts is None:
+            new_counts, since = self._fetch_play_counts(ids)
+
+        # Compare as flat arrays in TrackNo order; the last incremented song wins.
+        # When the caller hands back the counts we returned last time, reuse
+        # their array instead of rebuilding it from the dict.
+        curr = self._counts_array(ids, new_counts)
+        if state is not None and state[1].size == curr.size:
+            prev = state[1]
+        else:
+            prev = np.fromiter(
+                (previous_counts.get(cid, c) or 0 for cid, c in zip(ids, curr.tolist())),
+                dtype=np.int64, count=len(ids),
+            )
+        self._count_state[playlist] = (new_counts, curr, self._counts_total(new_counts), since)
+        # argmax on the reversed mask stops at the first True, i.e. the last change
+        changed = (curr > prev)[::-1]
+        last = int(changed.argmax()) if changed.size else 0
+        current = songs[len(songs) - 1 - last] if changed.size and changed[last] else None
 
         if current:
             return current, new_counts
@@ -155,12 +420,28 @@ class RekordboxPlaylistAnalyzer:
         """
         Base BPM = first track’s BPM by default;
         if average=True, returns the mean BPM across all songs.
+        Only the BPM column is read from the database.
         """
-        songs = self.get_playlist_songs_by_trackno(playlist)
-        bpms = [self.rekordbox_bpm_to_bpm(s.Content.BPM) for s in songs]
-        if not bpms:
+        pl = self.get_playlist(playlist)
+        if pl is None:
+            raise ValueError(f"Playlist '{playlist}' not found.")
+        query = (
+            select(DjmdContent.BPM)
+            .join(DjmdSongPlaylist, DjmdSongPlaylist.ContentID == DjmdContent.ID)
+            .where(DjmdSongPlaylist.PlaylistID == pl.ID)
+        )
+        if not average:
+            first = self.db.session.execute(
+                query.order_by(DjmdSongPlaylist.TrackNo).limit(1)
+            ).scalar()
+            return self.rekordbox_bpm_to_bpm(first)
+
+        bpms = np.fromiter(
+            (bpm or 0 for bpm in self.db.session.execute(query).scalars()), dtype=np.int64
+        )
+        if not bpms.size:
             return 0.0
-        return sum(bpms)/len(bpms) if average else bpms[0]
+        return float(bpms.mean()) / REKORDBOX_BPM_SCALE
 
     @staticmethod
     def get_bpm_multiplier(current_bpm: float, base_bpm: float) -> float:
@@ -177,55 +458,77 @@ class RekordboxPlaylistAnalyzer:
             playlist_name: str,
             *,
             max_songs: Optional[int] = None,
-    ) -> str:
-        playlist = self.playlists.get(playlist_name)
-        if playlist is None:
-            return f"Playlist '{playlist_name}' not found."
+            out: Optional[TextIO] = None,
+    ) -> Optional[str]:
+        """
+        Write the playlist report to `out` (in chunks of REPORT_FLUSH_EVERY songs) and
+        return None; without `out`, collect it and return it as a string.
+        """
+        buf = io.StringIO()
+
+        def emit(line: str) -> None:
+            buf.write(line)
+            buf.write("\n")
+
+        def flush() -> None:
+            if out is not None:
+                out.write(buf.getvalue())
+                buf.seek(0)
+                buf.truncate()
 
-        all_songs = sorted(playlist.Songs, key=lambda s: s.TrackNo)
-        if max_songs is not None and max_songs > 0:
-            all_songs = all_songs[:max_songs]
+        playlist = self.get_playlist(playlist_name)
+        if playlist is None:
+            emit(f"Playlist '{playlist_name}' not found.")
+            flush()
+            return buf.getvalue() if out is None else None
+
+        if max_songs is not None and max_songs > 0 and playlist_name not in self._sorted_cache:
+            # Only load the requested window; count the rest in SQL
+            all_songs = self._query_playlist_songs(playlist, limit=max_songs)
+            total_songs = self._count_playlist_songs(playlist)
+        else:
+            all_songs = self.get_playlist_songs_by_trackno(playlist_name)
+            total_songs = len(all_songs)
+            if max_songs is not None and max_songs > 0:
+                all_songs = all_songs[:max_songs]
 
-        output_lines = []
-        output_lines.append(f"Playlist '{playlist_name}' contains {len(playlist.Songs)} songs.")
-        output_lines.append(f"Analyzing first {len(all_songs)} songs...\n")
+        emit(f"Playlist '{playlist_name}' contains {total_songs} songs.")
+        emit(f"Analyzing first {len(all_songs)} songs...\n")
 
         total_duration_ms = 0
         total_adjusted_duration_ms = 0
+        processed_count = 0
         skipped_count = 0
         valid_count = 0
         prev_bpm = None
 
         for song in all_songs:
+            if processed_count % REPORT_FLUSH_EVERY == 0:
+                flush()
+            processed_count += 1
             content = song.Content
-            hot_cues: List[DjmdCue] = [cue for cue in content.Cues if not cue.is_memory_cue]
+            hot_cue_ms: List[int] = [cue.InMsec for cue in content.Cues if not cue.is_memory_cue]
 
-            if len(hot_cues) < 4:
-                output_lines.append(f"Skipping '{content.Title}': only {len(hot_cues)} hot cues.")
+            if len(hot_cue_ms) < 4:
+                emit(f"Skipping '{content.Title}': only {len(hot_cue_ms)} hot cues.")
                 skipped_count += 1
                 continue
 
-            hot_cues.sort(key=lambda c: c.InMsec)
-            distances = [
-                hot_cues[i + 1].InMsec - hot_cues[i].InMsec
-                for i in range(len(hot_cues) - 1)
-            ]
-            if len(distances) < 2:
-                output_lines.append(f"Skipping '{content.Title}': not enough distances.")
+            max_duration = top_two_gap_sum(hot_cue_ms)
+            if max_duration is None:
+                emit(f"Skipping '{content.Title}': not enough distances.")
                 skipped_count += 1
                 continue
 
             valid_count += 1
 
-            distances.sort(reverse=True)
-            max_duration = distances[0] + distances[1]
             duration_str = self.format_duration(max_duration)
 
             current_bpm = self.rekordbox_bpm_to_bpm(content.BPM)
             bpm_info = f"BPM {current_bpm:.2f}"
             adjusted_duration = max_duration
 
-            output_lines.append(
+            emit(
                 f"#{song.TrackNo:03d} – '{content.Title}': {max_duration} ms ({duration_str}); "
                 f"{bpm_info}, Key {content.Key.ScaleName}; Plays {content.DJPlayCount}"
             )
@@ -237,28 +540,29 @@ class RekordboxPlaylistAnalyzer:
                 ratio = current_bpm / adjusted_bpm if adjusted_bpm != 0 else 1
                 adjusted_duration = int(max_duration * ratio)
 
-                output_lines.append(
+                emit(
                     f"  * Adjusting tempo from {current_bpm:.2f} to {adjusted_bpm:.2f} BPM "
                     f"to meet halfway to previous BPM ({prev_bpm:.2f})"
                 )
-                output_lines.append(
+                emit(
                     f"  * Estimated adjusted playtime: {adjusted_duration} ms "
                     f"({self.format_duration(adjusted_duration)})"
                 )
             else:
-                output_lines.append("  ⮩ No previous BPM to compare for tempo adjustment.")
+                emit("  ⮩ No previous BPM to compare for tempo adjustment.")
 
             prev_bpm = current_bpm
             total_duration_ms += max_duration
             total_adjusted_duration_ms += adjusted_duration
 
-        output_lines.append("\n=== Total Set Duration ===")
-        output_lines.append(f"Original: {total_duration_ms} ms ({self.format_duration(total_duration_ms)})")
-        output_lines.append(f"Adjusted (half BPM diff per song): {total_adjusted_duration_ms} ms "
-                            f"({self.format_duration(total_adjusted_duration_ms)})")
-        output_lines.append(f"{len(output_lines) - 5} songs processed, "
-                            f"{skipped_count} skipped, "
-                            f"{valid_count} valid.")
+        emit("\n=== Total Set Duration ===")
+        emit(f"Original: {total_duration_ms} ms ({self.format_duration(total_duration_ms)})")
+        emit(f"Adjusted (half BPM diff per song): {total_adjusted_duration_ms} ms "
+             f"({self.format_duration(total_adjusted_duration_ms)})")
+        emit(f"{processed_count} songs processed, "
+             f"{skipped_count} skipped, "
+             f"{valid_count} valid.")
 
-        return "\n".join(output_lines)
+        flush()
+        return buf.getvalue() if out is None else None
 
@@ -7,72 +7,165 @@
 #  • --apply-order     : Reorder candidate TrackNo to match base
 #  • --force-order     : Proceed with reordering even if missing/extra tracks
 #  • --only-differences: Hide OK details; show only diffs
+#  • --stream          : Flush output per line instead of buffering the report
 
 # Example: python cdj_compare_playlists.py --base "Venture Eurobeat" --candidate "Venture Eurobeat USB" --apply-order --apply-hotcues
 
 import argparse, os, re, sys, unicodedata
-from dataclasses import dataclass
-from pathlib import Path
-from typing import Optional, List, Tuple
-from collections import defaultdict
+from array import array
+from dataclasses import dataclass, replace
+from typing import Optional, List, Tuple, Dict, Sequence, Callable
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from operator import attrgetter
 
 from RekordboxPlaylistAnalyzer import RekordboxPlaylistAnalyzer
 from pyrekordbox.db6.tables import DjmdCue
 
 _SUFFIX_TITLE_RE = re.compile(r"\s*\((?:320\s*mp3|AIFF|Transcoded)\)\s*$", re.IGNORECASE)
-_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+", re.IGNORECASE)
+# Lowercased ASCII → same string with everything but [0-9a-z] turned into spaces
+_NON_ALNUM_TABLE = str.maketrans({
+    chr(i): " " for i in range(128) if not ("0" <= chr(i) <= "9" or "a" <= chr(i) <= "z")
+})
+# Latin-1 Supplement and Latin Extended-A/B hold no combining marks, so NFKD +
+# ASCII-drop of such a string is the same as mapping each character on its own
+_LATIN_TO_ASCII_END = "\u0250"
+_LATIN_TO_ASCII = str.maketrans({
+    chr(i): unicodedata.normalize("NFKD", chr(i)).encode("ascii","ignore").decode("ascii")
+    for i in range(0x80, ord(_LATIN_TO_ASCII_END))
+})
+_FILE_SUFFIX_RE = re.compile(r"(?:_mp3_320|_aiff)$", re.IGNORECASE)
+_SPACE_RUN_RE = re.compile(r" {2,}")
+
+# Bound .sub methods for the per-track helpers below
+_SUFFIX_TITLE_SUB = _SUFFIX_TITLE_RE.sub
+_FILE_SUFFIX_SUB = _FILE_SUFFIX_RE.sub
+_SPACE_RUN_SUB = _SPACE_RUN_RE.sub
 
 # --- Normalization helpers ---------------------------------------------------
 
+# The same artist/title/stem strings recur across both playlists and the
+# post-verify reruns, so the pure string helpers are memoized.
+
 def _norm(s: Optional[str]) -> str:
     if not s: return ""
-    s = unicodedata.normalize("NFKD", s).encode("ascii","ignore").decode("ascii").lower()
-    s = _NON_ALNUM_RE.sub(" ", s)
-    return " ".join(s.split())
+    return _norm_cached(s)
+
+@lru_cache(maxsize=8192)
+def _norm_cached(s: str) -> str:
+    if s.isascii():
+        s = s.lower()
+    elif max(s) < _LATIN_TO_ASCII_END:
+        s = s.translate(_LATIN_TO_ASCII).lower()
+    else:
+        s = unicodedata.normalize("NFKD", s).encode("ascii","ignore").decode("ascii").lower()
+    return _SPACE_RUN_SUB(" ", s.translate(_NON_ALNUM_TABLE)).strip()
 
 def _strip_transcode_suffix_from_title(t: str) -> str:
-    return _SUFFIX_TITLE_RE.sub("", (t or "")).strip()
+    return _strip_transcode_suffix_cached(t or "")
+
+@lru_cache(maxsize=4096)
+def _strip_transcode_suffix_cached(t: str) -> str:
+    return _SUFFIX_TITLE_SUB("", t).strip()
 
+@lru_cache(maxsize=4096)
 def _strip_file_suffixes(stem: str) -> str:
-    return re.sub(r"(_mp3_320|_aiff)$","",stem,flags=re.IGNORECASE)
+    return _FILE_SUFFIX_SUB("", stem)
 
-_POSSIBLE_PATH_FIELDS_ORDERED = [
+_POSSIBLE_PATH_FIELDS_ORDERED = (
     "FilePath","FileFullPath","FileLPath","Location","OrigFilePath","AbsolutePath","Path","FullPath","URL"
-]
+)
+
+_IS_NT = os.name == "nt"
 
 def _normalize_urlish_path(p: str) -> str:
+    # Plain absolute POSIX paths that normpath would leave as-is (the macOS case)
+    if (not _IS_NT and p and p[0] == "/" and "\\" not in p
+            and "//" not in p and "/." not in p and not p.endswith("/")):
+        return p
     v = (p or "").replace("\\","/")
-    if v.lower().startswith("file:///"):
+    if v[:8].lower() == "file:///":
         v = v[8:]
-        if os.name=="nt" and len(v)>3 and v[0]=="/" and v[2]==":":
+        if _IS_NT and len(v)>3 and v[0]=="/" and v[2]==":":
             v=v[1:]
     return os.path.normpath(v)
 
-def _guess_content_path(c):
-    for n in _POSSIBLE_PATH_FIELDS_ORDERED:
-        if hasattr(c,n):
-            v = getattr(c,n)
-            if isinstance(v,str) and ("/" in v or "\\" in v):
-                return Path(_normalize_urlish_path(v))
-    child = getattr(c,"File",None)
+# Known path attributes on a Content.File child (checked instead of dir())
+_CHILD_PATH_FIELDS = ("FilePath","Path","Location","URL","FullPath","AbsolutePath")
+
+# Content / Content.File class → getter of the attribute that last held a path, tried first
+_PATH_ATTR_CACHE: Dict[type, Callable[[object], object]] = {}
+_CHILD_PATH_ATTR_CACHE: Dict[type, Callable[[object], object]] = {}
+
+@lru_cache(maxsize=None)
+def _declared_fields(cls: type, names: Tuple[str, ...]) -> Tuple[str, ...]:
+    """
+    The names a mapped (SQLAlchemy) class declares; its columns and relationships
+    always live on the class. Other classes keep every name (they may be set per instance).
+    """
+    if not hasattr(cls, "__mapper__"):
+        return names
+    return tuple(n for n in names if hasattr(cls, n))
+
+@lru_cache(maxsize=None)
+def _field_getters(cls: type, names: Tuple[str, ...]) -> Tuple[Callable[[object], object], ...]:
+    return tuple(attrgetter(n) for n in _declared_fields(cls, names))
+
+def _is_pathish(v) -> bool:
+    return isinstance(v,str) and ("/" in v or "\\" in v)
+
+def _find_path_attr(obj, names: Tuple[str, ...], cache: Dict[type, Callable[[object], object]]) -> Optional[str]:
+    """First path-like value among obj's fields, trying the getter that last worked for its class first."""
+    get = cache.get(type(obj))
+    if get is not None:
+        try: v = get(obj)
+        except AttributeError: v = None
+        if _is_pathish(v): return v
+    for get in _field_getters(type(obj),names):
+        try: v = get(obj)
+        except AttributeError: continue
+        if _is_pathish(v):
+            cache[type(obj)] = get
+            return v
+    return None
+
+def _guess_content_path_str(c) -> Optional[str]:
+    v = _find_path_attr(c,_POSSIBLE_PATH_FIELDS_ORDERED,_PATH_ATTR_CACHE)
+    if v is not None: return _normalize_urlish_path(v)
+    child = getattr(c,"File",None) if _declared_fields(type(c),("File",)) else None
     if child:
-        for n in dir(child):
-            if n.startswith("_"): continue
-            try: v = getattr(child,n)
-            except: continue
-            if isinstance(v,str) and ("/" in v or "\\" in v):
-                return Path(_normalize_urlish_path(v))
+        v = _find_path_attr(child,_CHILD_PATH_FIELDS,_CHILD_PATH_ATTR_CACHE)
+        if v is not None: return _normalize_urlish_path(v)
     return None
 
+_ARTIST_SOURCES = ("ArtistName","Artist","Artists")
+# Content class → getters for (ArtistName, Artist, Artists), None where skipped.
+# Sources declared on the class (mapped columns/relationships) get a plain
+# attrgetter; a class declaring none of them is probed for all per instance.
+_ARTIST_GETTERS_CACHE: Dict[type, Tuple[Optional[Callable[[object], object]], ...]] = {}
+
+def _artist_getters(cls) -> Tuple[Optional[Callable[[object], object]], ...]:
+    getters = _ARTIST_GETTERS_CACHE.get(cls)
+    if getters is None:
+        declared = [n for n in _ARTIST_SOURCES if hasattr(cls,n)]
+        if declared:
+            getters = tuple(attrgetter(n) if n in declared else None for n in _ARTIST_SOURCES)
+        else:
+            getters = tuple((lambda c, n=n: getattr(c,n,None)) for n in _ARTIST_SOURCES)
+        _ARTIST_GETTERS_CACHE[cls] = getters
+    return getters
+
 def _artist_text(c) -> str:
-    s = getattr(c,"ArtistName",None)
-    if isinstance(s,str) and s.strip(): return s
-    art_obj = getattr(c,"Artist",None)
-    for attr in ("Name","ArtistName"):
-        if art_obj and hasattr(art_obj,attr):
-            v = getattr(art_obj,attr)
+    get_name, get_artist, get_artists = _artist_getters(type(c))
+    if get_name:
+        s = get_name(c)
+        if isinstance(s,str) and s.strip(): return s
+    art_obj = get_artist(c) if get_artist else None
+    if art_obj:
+        for attr in ("Name","ArtistName"):
+            v = getattr(art_obj,attr,None)
             if isinstance(v,str) and v.strip(): return v
-    artists_list = getattr(c,"Artists",None)
+    artists_list = get_artists(c) if get_artists else None
     if isinstance(artists_list,(list,tuple)):
         names=[]
         for a in artists_list:
@@ -84,29 +177,39 @@ def _artist_text(c) -> str:
             else:
                 if isinstance(a,str) and a.strip(): names.append(a)
         if names: return " & ".join(names)
-    s2 = getattr(c,"Artist",None)
-    return s2 if isinstance(s2,str) and s2.strip() else ""
+    return art_obj if isinstance(art_obj,str) and art_obj.strip() else ""
 
 def _title_text(c) -> str:
     return _strip_transcode_suffix_from_title(getattr(c,"Title","") or "")
 
 # --- Hot-cue helpers ---------------------------------------------------------
 
-def _hot_cue_positions_ms(c) -> List[int]:
+_CUE_FLAG_AND_MS = attrgetter("is_memory_cue", "InMsec")
+
+def _hot_cues(cues) -> list:
+    """Only HOT cues (exclude memory cues); one is_memory_cue check per cue."""
+    return [cue for cue in cues if getattr(cue, "is_memory_cue", None) is not True]
+
+def _hot_cue_positions_ms(c) -> array:
+    """Sorted HOT cue positions in ms, packed as int32 (array 'i')."""
     cues = getattr(c, "Cues", None)
     if not isinstance(cues, (list, tuple)):
-        return []
+        return array("i")
+    try:
+        # One C-level call per cue for the usual (mapped) cue class
+        fields = [_CUE_FLAG_AND_MS(cue) for cue in cues]
+    except AttributeError:
+        fields = [(getattr(cue, "is_memory_cue", None), getattr(cue, "InMsec", None)) for cue in cues]
     out: List[int] = []
-    for cue in cues:
+    for is_memory, ms in fields:
         # Only HOT cues (exclude memory cues)
-        if getattr(cue, "is_memory_cue", None) is True:
+        if is_memory is True or ms is None:
             continue
-
-        ms = getattr(cue, "InMsec", None)
-        if ms is None:
+        if type(ms) is int:
+            out.append(ms)
             continue
 
-        # Accept int/float/Decimal/numpy-int-like
+        # Accept float/Decimal/numpy-int-like
         try:
             # round to nearest ms to avoid systematic truncation bias
             out.append(int(round(float(ms))))
@@ -115,31 +218,68 @@ def _hot_cue_positions_ms(c) -> List[int]:
             continue
 
     out.sort()
-    return out
+    return array("i", out)
 
 
-def _match_hot_cue_positions(base_ms: List[int], cand_ms: List[int], tol_ms: int):
-    used = [False] * len(cand_ms)
+def _match_hot_cue_positions(base_ms: Sequence[int], cand_ms: Sequence[int], tol_ms: int):
+    """
+    Each base cue (in order) takes the nearest unused candidate cue within
+    ±tol_ms, the earlier one on ties. Both lists are sorted, so the unused
+    candidates inside a window sliding along with the base cue stay sorted
+    too and are searched with bisect.
+    """
     matched_pairs = []
     unmatched_base = []
+    unmatched_cand = []
+    window: List[int] = []  # unused cand indices with cand_ms in [b - tol, b + tol]
+    ms_of = cand_ms.__getitem__
+    j = 0
     for b in base_ms:
-        found_j = None
-        best_abs_diff = None
-        for j, cm in enumerate(cand_ms):
-            if used[j]:
-                continue
-            diff = abs(cm - b)
-            if diff <= tol_ms and (best_abs_diff is None or diff < best_abs_diff):
-                best_abs_diff = diff
-                found_j = j
-        if found_j is None:
+        hi = bisect_right(cand_ms, b + tol_ms, j)
+        window.extend(range(j, hi))
+        j = hi
+        # Candidates left behind can't match any later (larger) base cue
+        k = bisect_left(window, b - tol_ms, key=ms_of)
+        if k:
+            unmatched_cand.extend(cand_ms[x] for x in window[:k])
+            del window[:k]
+        if not window:
             unmatched_base.append(b)
-        else:
-            used[found_j] = True
-            matched_pairs.append((b, cand_ms[found_j]))
-    unmatched_cand = [cand_ms[j] for j, u in enumerate(used) if not u]
+            continue
+        # Nearest is the first candidate >= b or the run of equal values just below it
+        p = bisect_left(window, b, key=ms_of)
+        if p == len(window) or (p > 0 and b - cand_ms[window[p - 1]] <= cand_ms[window[p]] - b):
+            p = bisect_left(window, cand_ms[window[p - 1]], key=ms_of)
+        matched_pairs.append((b, cand_ms[window.pop(p)]))
+    unmatched_cand.extend(cand_ms[x] for x in window)
+    unmatched_cand.extend(cand_ms[j:])
     return matched_pairs, unmatched_base, unmatched_cand
 
+class _Fenwick:
+    """Prefix sums over positions 1..n with point updates, both O(log n)."""
+
+    def __init__(self, n: int, fill: int = 0):
+        self.n = n
+        self.tree = [0] * (n + 1)
+        if fill:
+            for i in range(1, n + 1):
+                self.tree[i] += fill
+                j = i + (i & -i)
+                if j <= n:
+                    self.tree[j] += self.tree[i]
+
+    def add(self, i: int, delta: int) -> None:
+        while i <= self.n:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, i: int) -> int:
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
 def _fmt_ms(ms: int) -> str:
     s = ms // 1000
     m = s // 60
@@ -148,32 +288,36 @@ def _fmt_ms(ms: int) -> str:
 
 # --- Core record -------------------------------------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class Rec:
     content_id: int
     song_pl_id: str       # DjmdSongPlaylist.ID (needed for moving)
     artist_norm: str
     title_norm: str
+    at_key: str           # f"{artist_norm}|{title_norm}", the primary match key
     fb_norm: Optional[str]
     label: str
     track_no: int
     hot_cues: int
-    hot_cue_ms: List[int]
+    hot_cue_ms: array     # sorted HOT cue positions (int32)
 
 def _mk_rec(song) -> Rec:
     c = song.Content
     artist = _artist_text(c)
     title = _title_text(c)
     fb = None
-    p = _guess_content_path(c)
-    if p: fb = _norm(_strip_file_suffixes(p.stem))
+    p = _guess_content_path_str(c)
+    if p: fb = sys.intern(_norm(_strip_file_suffixes(os.path.splitext(os.path.basename(p))[0])))
     label = f"{artist} — {title}" if artist else title
+    # Interned, so the equal keys of base and candidate records compare by identity
+    artist_norm, title_norm = sys.intern(_norm(artist)), sys.intern(_norm(title))
     hot_ms = _hot_cue_positions_ms(c)
     return Rec(
         content_id=int(getattr(c, "ID")),
         song_pl_id=str(getattr(song, "ID")),            # <-- keep SongPlaylist row ID
-        artist_norm=_norm(artist),
-        title_norm=_norm(title),
+        artist_norm=artist_norm,
+        title_norm=title_norm,
+        at_key=sys.intern(f"{artist_norm}|{title_norm}"),
         fb_norm=fb,
         label=label,
         track_no=int(getattr(song, "TrackNo", 0) or 0),
@@ -186,43 +330,51 @@ def _playlist_entries(analyzer: RekordboxPlaylistAnalyzer,name:str)->List[Rec]:
 
 # --- Matching logic ----------------------------------------------------------
 
-def _index_many(values: List[int], key_fn):
-    d=defaultdict(list)
-    for i in values:
-        k = key_fn(i)
-        if k: d[k].append(i)
+def _index_keys(keys: List[Optional[str]]):
+    d={}
+    for i,k in enumerate(keys):
+        if k: d.setdefault(k,[]).append(i)
     return d
 
-def _pop(buckets,k):
+def _key_columns(recs: List[Rec]) -> Tuple[List[str], List[Optional[str]], List[str]]:
+    """Match keys as parallel lists: (artist|title, file-stem, title), one entry per record."""
+    return (
+        [r.at_key for r in recs],
+        [r.fb_norm for r in recs],
+        [r.title_norm for r in recs],
+    )
+
+def _pop_unused(buckets,k,used):
+    """Pop the last index in buckets[k] not yet marked used (lazy deletion)."""
     arr=buckets.get(k)
-    if arr: return arr.pop()
+    while arr:
+        j=arr.pop()
+        if not used[j]: return j
+    return None
 
 def _match(base:List[Rec],cand:List[Rec],title_fb=True) -> Tuple[List[Tuple[Rec,Rec]], List[Rec], List[Rec]]:
     nb,nc=len(base),len(cand)
-    used_b=[False]*nb
-    used_c=[False]*nc
+    used_b=bytearray(nb)  # 1 = matched
+    used_c=bytearray(nc)
     matches: List[Tuple[Rec,Rec]] = []
 
-    def cand_idx(): return [i for i in range(nc) if not used_c[i]]
-
-    b=_index_many(cand_idx(),lambda i:f"{cand[i].artist_norm}|{cand[i].title_norm}")
-    for i in range(nb):
-        if used_b[i]: continue
-        j=_pop(b,f"{base[i].artist_norm}|{base[i].title_norm}")
-        if j is not None: used_b[i]=used_c[j]=True; matches.append((base[i],cand[j]))
-
-    b=_index_many(cand_idx(),lambda i:cand[i].fb_norm)
-    for i in range(nb):
-        if used_b[i] or not base[i].fb_norm: continue
-        j=_pop(b,base[i].fb_norm)
-        if j is not None: used_b[i]=used_c[j]=True; matches.append((base[i],cand[j]))
-
-    if title_fb:
-        b=_index_many(cand_idx(),lambda i:cand[i].title_norm)
-        for i in range(nb):
-            if used_b[i]: continue
-            j=_pop(b,base[i].title_norm)
-            if j is not None: used_b[i]=used_c[j]=True; matches.append((base[i],cand[j]))
+    # Passes in priority order, each over plain key lists; every candidate index
+    # is built once and entries matched by an earlier pass are skipped on pop
+    base_at,base_fb,base_title=_key_columns(base)
+    cand_at,cand_fb,cand_title=_key_columns(cand)
+    passes=[(base_at,cand_at),(base_fb,cand_fb)]
+    if title_fb: passes.append((base_title,cand_title))
+
+    for base_keys,cand_keys in passes:
+        # Later passes only matter while both sides still have unmatched tracks
+        # and some unmatched base track has a key for this pass
+        if len(matches) in (nb,nc): break
+        if not any(k for i,k in enumerate(base_keys) if not used_b[i]): continue
+        buckets=_index_keys(cand_keys)
+        for i,k in enumerate(base_keys):
+            if used_b[i] or not k: continue
+            j=_pop_unused(buckets,k,used_c)
+            if j is not None: used_b[i]=used_c[j]=1; matches.append((base[i],cand[j]))
 
     missing=[base[i] for i in range(nb) if not used_b[i]]
     extra=[cand[i] for i in range(nc) if not used_c[i]]
@@ -230,12 +382,13 @@ def _match(base:List[Rec],cand:List[Rec],title_fb=True) -> Tuple[List[Tuple[Rec,
 
 # --- DB write helpers (hot-cues) --------------------------------------------
 
+# DjmdCue columns copied when cloning a cue (the clone gets its own ID/ContentID)
+_DJMD_CUE_CLONE_COLS = tuple(col for col in DjmdCue.columns() if col not in ("ID", "ContentID"))
+
 def _delete_existing_hot_cues(db, content_id: int) -> int:
     deleted = 0
     q = db.get_cue(ContentID=str(content_id))
-    for cue in q.all():
-        if getattr(cue, "is_memory_cue", False) is True:
-            continue
+    for cue in _hot_cues(q.all()):
         db.delete(cue)
         deleted += 1
     db.flush()
@@ -245,35 +398,11 @@ def _clone_hot_cues_from_base_to_cand(db, base_content_id: int, cand_content_id:
     deleted = _delete_existing_hot_cues(db, cand_content_id)
     created = 0
 
-    cue_columns = [col for col in DjmdCue.columns() if col not in ("ID", "ContentID")]
     base_q = db.get_cue(ContentID=str(base_content_id))
 
-    for base_cue in base_q.all():
-        if getattr(base_cue, "is_memory_cue", False) is True:
-            continue
-
-        kwargs = {}
-        for col in cue_columns:
-            v = None
-            ok = False
-
-            # Prefer attribute access (more reliable in many ORMs)
-            try:
-                v = getattr(base_cue, col)
-                ok = True
-            except Exception:
-                ok = False
-
-            # Fallback: mapping-style access
-            if not ok:
-                try:
-                    v = base_cue[col]
-                    ok = True
-                except Exception:
-                    ok = False
-
-            if ok:
-                kwargs[col] = v
+    for base_cue in _hot_cues(base_q.all()):
+        # Every name in _DJMD_CUE_CLONE_COLS is a mapped column, so plain attribute access works
+        kwargs = {col: getattr(base_cue, col) for col in _DJMD_CUE_CLONE_COLS}
 
         new_id = db.generate_unused_id(DjmdCue, is_28_bit=True)
         new_cue = DjmdCue.create(ID=int(new_id), ContentID=str(cand_content_id), **kwargs)
@@ -285,7 +414,7 @@ def _clone_hot_cues_from_base_to_cand(db, base_content_id: int, cand_content_id:
 
 
 
-def _pairwise_deltas(base_ms: List[int], cand_ms: List[int]) -> List[Tuple[int,int,int]]:
+def _pairwise_deltas(base_ms: Sequence[int], cand_ms: Sequence[int]) -> List[Tuple[int,int,int]]:
     """
     Pair by sorted order (index-to-index). Great for 'how many ms off' reporting.
     Returns list of (base, cand, cand-base).
@@ -302,7 +431,7 @@ def _summarize_deltas(deltas: List[Tuple[int,int,int]]) -> Tuple[int, float, int
     net = sum(d for (_,_,d) in deltas)  # sign matters (systematic offset)
     return (max_abs, avg_abs, net)
 
-def _print_hotcue_delta_report(base_ms: List[int], cand_ms: List[int], indent: str = "      "):
+def _print_hotcue_delta_report(base_ms: Sequence[int], cand_ms: Sequence[int], indent: str = "      "):
     deltas = _pairwise_deltas(base_ms, cand_ms)
     max_abs, avg_abs, net = _summarize_deltas(deltas)
 
@@ -323,6 +452,13 @@ def _print_hotcue_delta_report(base_ms: List[int], cand_ms: List[int], indent: s
 
 # --- Main --------------------------------------------------------------------
 
+# Per-match header in the detailed report (one print per matched track)
+_MATCH_DETAIL_TEMPLATE = (
+    "  ={marker} {label}\n"
+    "       • TrackNo: base #{bt} | cand #{ct}\n"
+    "       • Hot cues (count): base {bh} | cand {ch}"
+)
+
 def main():
     ap=argparse.ArgumentParser()
     ap.add_argument("--base",required=True)
@@ -338,8 +474,14 @@ def main():
                     help="Proceed with reordering even if there are missing/extra tracks (moves only matched ones).")
     ap.add_argument("--only-differences", action="store_true",
                     help="Show only differences (omit per-track OK details).")
+    ap.add_argument("--stream", action="store_true",
+                    help="Flush output line by line (default: buffer the report and write it in blocks).")
     args=ap.parse_args()
 
+    if not args.stream:
+        # The report is hundreds of print() calls; on a console each would flush
+        sys.stdout.reconfigure(line_buffering=False)
+
     a=RekordboxPlaylistAnalyzer()
     try:
         base=_playlist_entries(a,args.base)
@@ -364,10 +506,10 @@ def main():
     for b,c in matches:
         counts_equal = (b.hot_cues == c.hot_cues)
         if not args.only_differences:
-            marker = " " if counts_equal else " ⚠️"
-            print(f"  ={marker} {b.label}")
-            print(f"       • TrackNo: base #{b.track_no} | cand #{c.track_no}")
-            print(f"       • Hot cues (count): base {b.hot_cues} | cand {c.hot_cues}")
+            print(_MATCH_DETAIL_TEMPLATE.format(
+                marker=" " if counts_equal else " ⚠️", label=b.label,
+                bt=b.track_no, ct=c.track_no, bh=b.hot_cues, ch=c.hot_cues,
+            ))
 
         if not counts_equal:
             hotcue_count_mismatches.append((b,c))
@@ -445,7 +587,7 @@ def main():
         if (missing or extra) and not args.force_order:
             print("⚠️  Not reordering because candidate differs in membership.")
             print("    Use --force-order to move only the matched tracks anyway.\n")
-        cand_playlist = a.playlists.get(args.candidate)
+        cand_playlist = a.get_playlist(args.candidate)
         if cand_playlist is None:
             print(f"❌ Candidate playlist '{args.candidate}' not found."); sys.exit(2)
 
@@ -453,43 +595,71 @@ def main():
         desired = sorted(matches, key=lambda t: t[0].track_no)
         desired_ids = [c.song_pl_id for (b, c) in desired]
 
-        # Current positions map from the playlist as-is (TrackNo order)
         # 'cand' is already in TrackNo order from earlier
         cand_ids_in_order = [r.song_pl_id for r in cand]
-        pos = {sid: i + 1 for i, sid in enumerate(cand_ids_in_order)}
-
-        # Plan-less stable resequencing: place #1, then #2, ... updating positions after each move
+        orig_pos = {sid: k for k, sid in enumerate(cand_ids_in_order, start=1)}
+        label_by_sid = {c.song_pl_id: c.label for (b, c) in matches}
+
+        # Tracks placed so far sit at #1..#(i-1); all others keep their original
+        # relative order behind them. So a track's current TrackNo is (i-1) plus
+        # its rank among the unplaced ones, counted by a Fenwick tree over the
+        # original positions instead of rippling a position map on every move.
+        unplaced = _Fenwick(len(cand_ids_in_order), fill=1)
+        pos = None  # explicit sid → TrackNo map, only needed once a move failed
+
+        def explicit_positions(placed: int) -> dict:
+            done = desired_ids[:placed]
+            done_set = set(done)
+            rest = [sid for sid in cand_ids_in_order if sid not in done_set]
+            return {sid: n for n, sid in enumerate(done + rest, start=1)}
+
+        # Plan-less stable resequencing: place #1, then #2, ...
         moves_made = []
         for i, sid in enumerate(desired_ids, start=1):
-            curr = pos.get(sid)
-            if curr is None:
-                # Shouldn’t happen for matched tracks, but guard anyway
-                continue
+            if pos is None:
+                k = orig_pos.get(sid)
+                if k is None:
+                    pos = explicit_positions(i - 1)
+            if pos is None:
+                curr = i - 1 + unplaced.prefix_sum(k)
+            else:
+                curr = pos.get(sid)
+                if curr is None:
+                    # Shouldn’t happen for matched tracks, but guard anyway
+                    continue
             if curr == i:
+                if pos is None:
+                    unplaced.add(k, -1)
                 continue
 
             # Print and perform the move
-            label = next((c.label for (b,c) in matches if c.song_pl_id == sid), sid)
+            label = label_by_sid.get(sid, sid)
             print(f"  • {label}: cand #{curr} → #{i}")
             try:
                 a.db.move_song_in_playlist(cand_playlist, sid, new_track_no=i)
             except Exception as ex:
                 print(f"    ⚠️ Move failed for '{label}' (song_id={sid}): {ex}")
-                # Don’t try to “fake” the map if the DB move failed
+                # Don’t try to “fake” the positions if the DB move failed;
+                # from here on track them explicitly
+                if pos is None:
+                    pos = explicit_positions(i - 1)
                 continue
 
-            # Update our in-memory position map to reflect the ripple
-            if i > curr:
-                # Everything between (curr, i] shifts down by 1
-                for other_id, p in pos.items():
-                    if curr < p <= i:
-                        pos[other_id] = p - 1
+            if pos is None:
+                unplaced.add(k, -1)
             else:
-                # Everything between [i, curr) shifts up by 1
-                for other_id, p in pos.items():
-                    if i <= p < curr:
-                        pos[other_id] = p + 1
-            pos[sid] = i
+                # Update the explicit position map to reflect the ripple
+                if i > curr:
+                    # Everything between (curr, i] shifts down by 1
+                    for other_id, p in pos.items():
+                        if curr < p <= i:
+                            pos[other_id] = p - 1
+                else:
+                    # Everything between [i, curr) shifts up by 1
+                    for other_id, p in pos.items():
+                        if i <= p < curr:
+                            pos[other_id] = p + 1
+                pos[sid] = i
             moves_made.append((label, curr, i))
 
         if moves_made:
@@ -513,8 +683,15 @@ def main():
 
         # --- Post-verify after reordering ---
         print("\n=== Post-order verification ===")
-        cand_after = _playlist_entries(a, args.candidate)
-        matches_after, missing_after, extra_after = _match(base, cand_after, not args.no_title_fallback)
+        if pos is None:
+            # Every move went through, so the final TrackNos follow from the
+            # placement order; membership is unchanged, so the matches still hold
+            final_pos = explicit_positions(len(desired_ids))
+            matches_after = [(b, replace(c, track_no=final_pos[c.song_pl_id])) for (b, c) in matches]
+            missing_after, extra_after = missing, extra
+        else:
+            cand_after = _playlist_entries(a, args.candidate)
+            matches_after, missing_after, extra_after = _match(base, cand_after, not args.no_title_fallback)
         misaligned_after = [(b, c) for (b, c) in matches_after if b.track_no != c.track_no]
         if not misaligned_after and not missing_after and not extra_after:
             print("✅ Candidate order now matches base exactly.")
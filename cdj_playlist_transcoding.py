@@ -7,38 +7,54 @@
 # Usage:
 #   python convert_playlist_audio.py --playlist "My Playlist"
 #   python convert_playlist_audio.py --playlist "My Playlist" --format mp3
+#   python convert_playlist_audio.py --playlist "My Playlist" --ffmpeg-batch 8
+#   python convert_playlist_audio.py --playlist "My Playlist" --jobs 4 --ffmpeg-threads 2
+#   python convert_playlist_audio.py --playlist "My Playlist" --skip-if-newer
 #
 # Output:
 #   Creates "<playlist>_<fmt>" next to this script, where <fmt> is "aiff" or
 #   "mp3_320". Filenames are "<original_stem>_<fmt>.<ext>".
 #   Title tag is suffixed with " (AIFF)" or " (320 mp3)".
 #   Artwork and common metadata are copied from the source.
+#   A .cdj_sources.json in the folder records which source each file came
+#   from, so --skip-* never keeps a file converted from a different track.
 # ---------------------------------------------------------------------------
 
 import argparse
+import atexit
+import ctypes
+import io
+import json
 import os
+import pickle
 import shutil
 import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Optional, Iterable, Tuple, Dict, Any
+from typing import Optional, Iterable, Tuple, Dict, Any, Set, List, Callable
 
 from RekordboxPlaylistAnalyzer import RekordboxPlaylistAnalyzer
 
 # --- Artwork/metadata helpers (mutagen) ---
-from mutagen import File as MutagenFile
+from mutagen import File as MutagenFile, MutagenError
 from mutagen.id3 import (
     ID3, APIC, TIT2, TALB, TPE1, TPE2, TCON, TYER, TRCK, TPOS, COMM, TCOM,
     ID3NoHeaderError, PIC
 )
 from mutagen.flac import FLAC
+from mutagen.mp3 import MP3
 from mutagen.mp4 import MP4, MP4Cover
 from mutagen.aiff import AIFF
 import time
 
-AUDIO_EXTS = {
+AUDIO_EXTS = frozenset({
     ".mp3", ".wav", ".aiff", ".aif", ".flac", ".m4a", ".alac", ".aac", ".ogg", ".wma"
-}
+})
 
+@lru_cache(maxsize=None)
 def ensure_ffmpeg() -> str:
     ffmpeg = shutil.which("ffmpeg")
     if not ffmpeg:
@@ -46,11 +62,26 @@ def ensure_ffmpeg() -> str:
     return ffmpeg
 
 def _is_audio_path(p: str) -> bool:
-    try:
-        ext = Path(p).suffix.lower()
-    except Exception:
-        return False
-    return ext in AUDIO_EXTS
+    # Plain string slicing; no extension contains a separator, so "a.b/c" can't match
+    i = p.rfind(".")
+    return i >= 0 and p[i:].lower() in AUDIO_EXTS
+
+# Directory → os.path.normcase'd names of the regular files in it, listed once per run.
+# Playlist tracks mostly share a few album folders, so one scandir replaces many stats.
+_DIR_FILES: Dict[str, frozenset] = {}
+
+def _isfile(path: str) -> bool:
+    """os.path.isfile answered from a cached listing of the containing directory."""
+    d, name = os.path.split(os.path.normpath(path))
+    files = _DIR_FILES.get(d)
+    if files is None:
+        try:
+            with os.scandir(d or ".") as it:
+                files = frozenset(os.path.normcase(e.name) for e in it if e.is_file())
+        except OSError:
+            files = frozenset()
+        _DIR_FILES[d] = files
+    return os.path.normcase(name) in files
 
 def _join_if_all(*parts: Optional[str]) -> Optional[str]:
     parts_ok = [p for p in parts if isinstance(p, str) and p.strip()]
@@ -58,137 +89,229 @@ def _join_if_all(*parts: Optional[str]) -> Optional[str]:
         return None
     return os.path.normpath(os.path.join(*parts_ok))
 
-def _candidate_strings_from_obj(obj) -> Iterable[Tuple[str, str]]:
-    preferred_attrs = [
-        "FilePath", "FileFullPath", "FileLPath", "Location", "OrigFilePath",
-        "AbsolutePath", "Path", "FullPath", "URL"
-    ]
-    seen = set()
-    for name in preferred_attrs:
-        if hasattr(obj, name):
-            val = getattr(obj, name)
-            if isinstance(val, str) and (os.sep in val or _is_audio_path(val)):
-                seen.add(name)
-                yield name, val
-    for name in dir(obj):
-        if name in seen or name.startswith("_"):
-            continue
-        try:
-            val = getattr(obj, name)
-        except Exception:
+_PREFERRED_PATH_ATTRS = (
+    "FilePath", "FileFullPath", "FileLPath", "Location", "OrigFilePath",
+    "AbsolutePath", "Path", "FullPath", "URL"
+)
+
+# Content class → attribute that last yielded an existing file, tried first
+_RESOLVED_PATH_ATTRS: Dict[type, str] = {}
+
+@lru_cache(maxsize=None)
+def _path_attrs_for(cls: type) -> Tuple[str, ...]:
+    """
+    The preferred path attributes a mapped (SQLAlchemy) class declares, computed once per class.
+    Other classes keep every name (they may be set per instance).
+    """
+    if not hasattr(cls, "__mapper__"):
+        return _PREFERRED_PATH_ATTRS
+    return tuple(n for n in _PREFERRED_PATH_ATTRS if hasattr(cls, n))
+
+def _normalize_file_url(val: str) -> str:
+    v = val
+    if v[:8].lower() == "file:///":
+        v = v[8:]
+        if os.name == "nt" and v.startswith("/") and len(v) > 3 and v[2] == ":":
+            v = v[1:]
+    return os.path.normpath(v)
+
+def _first_candidate_path(obj) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Scan obj's preferred path attributes in order and stop at the first existing audio file.
+    Returns (attr_name, existing_path, first_missing_audio_path).
+    """
+    first_missing: Optional[str] = None
+    for name in _path_attrs_for(type(obj)):
+        val = getattr(obj, name, None)
+        if not isinstance(val, str) or not ("/" in val or "\\" in val or _is_audio_path(val)):
             continue
-        if isinstance(val, str) and (os.sep in val or _is_audio_path(val)):
-            yield name, val
+        path = _normalize_file_url(val)
+        if _is_audio_path(path):
+            if _isfile(path):
+                return name, path, first_missing
+            if first_missing is None:
+                first_missing = path
+    return None, None, first_missing
+
+_DIR_LIKE_ATTRS = ("Dir", "Directory", "Folder", "FileDir", "DirPath")
+_FILE_LIKE_ATTRS = ("FileName", "Filename", "Name", "TitleFile")
+
+def _probe(obj) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Look for obj's audio file: first its path attributes, then a directory + file name pair.
+    Returns (attr_name or None for a joined pair, existing_path, first_missing_audio_path).
+    """
+    name, path, missing = _first_candidate_path(obj)
+    if path is not None:
+        return name, path, missing
+
+    dir_val = next((getattr(obj, n) for n in _DIR_LIKE_ATTRS if hasattr(obj, n)), None)
+    file_val = next((getattr(obj, n) for n in _FILE_LIKE_ATTRS if hasattr(obj, n)), None)
+    joined = _join_if_all(dir_val, file_val)  # already normpath'd
+    if joined and _is_audio_path(joined):
+        if _isfile(joined):
+            return None, joined, missing
+        if missing is None:
+            missing = joined
+    return None, None, missing
 
 def guess_content_file_path(content) -> Optional[str]:
-    best_nonexistent: Optional[str] = None
-
-    def _normalize(val: str) -> str:
-        v = val
-        if v.lower().startswith("file:///"):
-            v = v[8:]
-            if os.name == "nt" and v.startswith("/") and len(v) > 3 and v[2] == ":":
-                v = v[1:]
-        return os.path.normpath(v)
-
-    for _, val in _candidate_strings_from_obj(content):
-        path = _normalize(val)
-        if _is_audio_path(path):
-            if os.path.isfile(path):
+    """Return the source file of a DjmdContent (or the best guess if none exists)."""
+    cls = type(content)
+    resolved = _RESOLVED_PATH_ATTRS.get(cls)
+    if resolved is not None:
+        val = getattr(content, resolved, None)
+        if isinstance(val, str):
+            path = _normalize_file_url(val)
+            if _is_audio_path(path) and _isfile(path):
                 return path
-            if best_nonexistent is None:
-                best_nonexistent = path
-
-    dir_like_names = ["Dir", "Directory", "Folder", "FileDir", "DirPath"]
-    file_like_names = ["FileName", "Filename", "Name", "TitleFile"]
-    dir_val = next((getattr(content, n) for n in dir_like_names if hasattr(content, n)), None)
-    file_val = next((getattr(content, n) for n in file_like_names if hasattr(content, n)), None)
-    joined = _join_if_all(dir_val, file_val)
-    if joined and _is_audio_path(joined):
-        if os.path.isfile(joined):
-            return os.path.normpath(joined)
-        if best_nonexistent is None:
-            best_nonexistent = os.path.normpath(joined)
+
+    name, path, best_nonexistent = _probe(content)
+    if path is not None:
+        if name is not None:
+            _RESOLVED_PATH_ATTRS[cls] = name
+        return path
 
     child = getattr(content, "File", None)
     if child is not None:
-        for _, val in _candidate_strings_from_obj(child):
-            path = _normalize(val)
-            if _is_audio_path(path):
-                if os.path.isfile(path):
-                    return path
-                if best_nonexistent is None:
-                    best_nonexistent = path
-
-        dir_val = next((getattr(child, n) for n in dir_like_names if hasattr(child, n)), None)
-        file_val = next((getattr(child, n) for n in file_like_names if hasattr(child, n)), None)
-        joined = _join_if_all(dir_val, file_val)
-        if joined and _is_audio_path(joined):
-            if os.path.isfile(joined):
-                return os.path.normpath(joined)
-            if best_nonexistent is None:
-                best_nonexistent = os.path.normpath(joined)
+        _, path, missing = _probe(child)
+        if path is not None:
+            return path
+        if best_nonexistent is None:
+            best_nonexistent = missing
 
     return best_nonexistent
 
-def unique_with_counter(base_path: Path) -> Path:
-    """If base_path exists, append (2), (3), ... before suffix."""
-    if not base_path.exists():
-        return base_path
+def unique_with_counter(base_path: Path, existing: Set[str]) -> Path:
+    """
+    If base_path's name is taken, append (2), (3), ... before suffix.
+    `existing` holds the os.path.normcase'd names already taken; the chosen name is added to it.
+    """
     stem, suffix = base_path.stem, base_path.suffix
+    name = base_path.name
     i = 2
-    while True:
-        candidate = base_path.with_name(f"{stem} ({i}){suffix}")
-        if not candidate.exists():
-            return candidate
+    while os.path.normcase(name) in existing:
+        name = f"{stem} ({i}){suffix}"
         i += 1
+    existing.add(os.path.normcase(name))
+    return base_path.with_name(name)
 
-# ------------------ Artwork extraction ------------------
+# Output filename (normcase'd) → source path it was converted from
+_SOURCES_MANIFEST = ".cdj_sources.json"
+
+def _load_sources_manifest(out_dir: Path) -> Dict[str, str]:
+    try:
+        with open(out_dir / _SOURCES_MANIFEST, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
 
-def _get_cover_from_src(src_path: Path) -> Optional[Tuple[bytes, str]]:
+def _save_sources_manifest(out_dir: Path, manifest: Dict[str, str]) -> None:
+    try:
+        with open(out_dir / _SOURCES_MANIFEST, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+    except OSError as e:
+        print(f"[warn] Could not save '{_SOURCES_MANIFEST}': {e}")
+
+@lru_cache(maxsize=None)
+def _kernel32():
+    """kernel32 with the prototypes _set_creation_time needs (HANDLE is 64-bit on Win64)."""
+    from ctypes import wintypes
+    k32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    k32.CreateFileW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, ctypes.c_void_p,
+                                wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE]
+    k32.CreateFileW.restype = wintypes.HANDLE
+    ft_p = ctypes.POINTER(wintypes.FILETIME)
+    k32.SetFileTime.argtypes = [wintypes.HANDLE, ft_p, ft_p, ft_p]
+    k32.SetFileTime.restype = wintypes.BOOL
+    k32.CloseHandle.argtypes = [wintypes.HANDLE]
+    k32.CloseHandle.restype = wintypes.BOOL
+    return k32
+
+def _set_creation_time(path: Path, ts: float) -> bool:
     """
-    Returns (image_bytes, mime) if artwork is found in src, else None.
-    Handles MP3(ID3 APIC/PIC), MP4/M4A (covr), and FLAC pictures.
+    Windows only: set the file's creation time too, since Explorer can sort by it.
+    Returns whether it was set; callers ignore failures, as mtime already carries the ordering.
     """
-    audio = MutagenFile(src_path)
-    if audio is None:
+    if os.name != "nt":
+        return False
+    from ctypes import wintypes
+    kernel32 = _kernel32()
+    # FILETIME: 100ns ticks since 1601-01-01
+    ticks = int(ts * 10_000_000) + 116444736000000000
+    ft = wintypes.FILETIME(ticks & 0xFFFFFFFF, ticks >> 32)
+    FILE_WRITE_ATTRIBUTES, OPEN_EXISTING = 0x100, 3
+    INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+    handle = kernel32.CreateFileW(str(path), FILE_WRITE_ATTRIBUTES, 0, None, OPEN_EXISTING, 0, None)
+    if handle is None or handle == INVALID_HANDLE_VALUE:
+        return False
+    try:
+        return bool(kernel32.SetFileTime(handle, ctypes.byref(ft), None, None))
+    finally:
+        kernel32.CloseHandle(handle)
+
+# ------------------ Artwork extraction ------------------
+
+def _cover_from_id3(audio) -> Optional[Tuple[bytes, str]]:
+    tags = audio.tags
+    if not isinstance(tags, ID3):
         return None
+    apics = tags.getall("APIC")
+    if apics:
+        apic = apics[0]
+        if getattr(apic, "data", None):
+            mime = apic.mime or "image/jpeg"
+            return apic.data, mime
+    pics = tags.getall("PIC")
+    if pics:
+        pic = pics[0]
+        if getattr(pic, "data", None):
+            mime = getattr(pic, "mime", None) or "image/jpeg"
+            return pic.data, mime
+    return None
 
-    # MP3 (ID3)
-    if hasattr(audio, "tags") and isinstance(audio.tags, ID3):
-        apics = audio.tags.getall("APIC")
-        if apics:
-            apic = apics[0]
-            if getattr(apic, "data", None):
-                mime = apic.mime or "image/jpeg"
-                return bytes(apic.data), mime
-        pics = audio.tags.getall("PIC")
-        if pics:
-            pic = pics[0]
-            if getattr(pic, "data", None):
-                mime = getattr(pic, "mime", None) or "image/jpeg"
-                return bytes(pic.data), mime
+def _cover_from_mp4(audio) -> Optional[Tuple[bytes, str]]:
+    covr = audio.tags.get("covr") if audio.tags is not None else None
+    if covr:
+        cov = covr[0]
+        if isinstance(cov, MP4Cover):
+            if cov.imageformat == MP4Cover.FORMAT_PNG:
+                return cov, "image/png"
+            else:
+                return cov, "image/jpeg"
+    return None
 
-    # MP4/M4A
-    if isinstance(audio, MP4):
-        covr = audio.tags.get("covr")
-        if covr:
-            cov = covr[0]
-            if isinstance(cov, MP4Cover):
-                if cov.imageformat == MP4Cover.FORMAT_PNG:
-                    return bytes(cov), "image/png"
-                else:
-                    return bytes(cov), "image/jpeg"
-
-    # FLAC
-    if isinstance(audio, FLAC) and audio.pictures:
+def _cover_from_flac(audio) -> Optional[Tuple[bytes, str]]:
+    if audio.pictures:
         pic = audio.pictures[0]
         if getattr(pic, "data", None):
             mime = pic.mime or "image/jpeg"
-            return bytes(pic.data), mime
-
+            return pic.data, mime
     return None
 
+# Parsed file type → artwork extractor; other types fall back to isinstance checks
+_COVER_EXTRACTORS = {MP3: _cover_from_id3, AIFF: _cover_from_id3, MP4: _cover_from_mp4, FLAC: _cover_from_flac}
+
+def _cover_from_audio(audio) -> Optional[Tuple[bytes, str]]:
+    """
+    Returns (image_bytes, mime) if artwork is found in the parsed file, else None.
+    Handles MP3(ID3 APIC/PIC), MP4/M4A (covr), and FLAC pictures.
+    """
+    if audio is None:
+        return None
+    extract = _COVER_EXTRACTORS.get(type(audio))
+    if extract is None:
+        if isinstance(getattr(audio, "tags", None), ID3):
+            extract = _cover_from_id3
+        elif isinstance(audio, MP4):
+            extract = _cover_from_mp4
+        elif isinstance(audio, FLAC):
+            extract = _cover_from_flac
+        else:
+            return None
+    return extract(audio)
+
 # ------------------ Common metadata extraction ------------------
 
 def _get_text(v: Any) -> Optional[str]:
@@ -198,15 +321,17 @@ def _get_text(v: Any) -> Optional[str]:
         if not v:
             return None
         v = v[0]
+    if type(v) is str:  # MP4/Vorbis values; skips the str() round-trip
+        return v.strip() or None
     try:
         s = str(v).strip()
         return s or None
     except Exception:
         return None
 
-def _read_common_tags(src: Path) -> Dict[str, Optional[str]]:
+def _common_tags_from_audio(audio, src: Path) -> Dict[str, Optional[str]]:
     """
-    Return a dict of common tags from the source file:
+    Return a dict of common tags from the parsed source file:
       album, artist, albumartist, date(year), track, track_total, disc, disc_total, genre, comment, composer
     """
     info = {
@@ -221,7 +346,6 @@ def _read_common_tags(src: Path) -> Dict[str, Optional[str]]:
         "composer": None,
     }
 
-    audio = MutagenFile(src, easy=False)
     if audio is None:
         return info
 
@@ -297,8 +421,8 @@ def _read_common_tags(src: Path) -> Dict[str, Optional[str]]:
         info["composer"] = g("composer")
         return info
 
-    # Fallback for others via Easy tags if possible
-    easy = MutagenFile(src, easy=True)
+    # Fallback for others via Easy tags if possible (only re-parse when there are tags)
+    easy = MutagenFile(src, easy=True) if audio.tags else None
     if easy and easy.tags:
         et = easy.tags
         def eg(k): return _get_text(et.get(k))
@@ -321,34 +445,160 @@ def _read_common_tags(src: Path) -> Dict[str, Optional[str]]:
         info["composer"] = eg("composer")
     return info
 
+# Extension → mutagen class, so common formats skip MutagenFile's probe of every format
+_MUTAGEN_BY_EXT = {
+    ".mp3": MP3, ".flac": FLAC, ".m4a": MP4, ".alac": MP4, ".aiff": AIFF, ".aif": AIFF,
+}
+
+def _open_mutagen(src: Path):
+    cls = _MUTAGEN_BY_EXT.get(src.suffix.lower())
+    if cls is not None:
+        try:
+            return cls(src)
+        except MutagenError:
+            pass  # mislabeled file; let MutagenFile sniff the real format
+    return MutagenFile(src, easy=False)
+
+def _extract_src_metadata(src: Path) -> Tuple[Optional[Tuple[bytes, str]], Dict[str, Optional[str]]]:
+    """
+    Parse src once and return (cover, common_tags).
+    """
+    audio = _open_mutagen(src)
+    return _cover_from_audio(audio), _common_tags_from_audio(audio, src)
+
+# (path, st_mtime_ns, st_size) → (cover, mime) or None, common tags; persisted between runs.
+# Entries whose source was edited, moved or deleted are dropped when the cache is saved.
+_META_CACHE_FILE = Path(__file__).resolve().parent / ".cdj_transcode_cache.pickle"
+_META_CACHE_VERSION = 2
+_meta_cache: Optional[Dict[Tuple[str, int, int], Tuple[Optional[Tuple[bytes, str]], Dict[str, Optional[str]]]]] = None
+_meta_cache_used: Set[Tuple[str, int, int]] = set()
+_meta_cache_dirty = False
+_meta_cache_lock = threading.Lock()
+
+def _load_meta_cache() -> Dict:
+    global _meta_cache
+    with _meta_cache_lock:
+        if _meta_cache is None:
+            try:
+                with open(_META_CACHE_FILE, "rb") as f:
+                    stored = pickle.load(f)
+            except Exception:
+                # Only a cache: a missing, stale or foreign file just starts empty
+                stored = None
+            if (isinstance(stored, dict) and stored.get("version") == _META_CACHE_VERSION
+                    and isinstance(stored.get("entries"), dict)):
+                _meta_cache = stored["entries"]
+            else:
+                _meta_cache = {}
+            atexit.register(_save_meta_cache)
+    return _meta_cache
+
+def _is_current(key: Tuple[str, int, int]) -> bool:
+    path, mtime_ns, size = key
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return st.st_mtime_ns == mtime_ns and st.st_size == size
+
+def _save_meta_cache() -> None:
+    """
+    Write the cache back without entries whose source changed or is gone.
+    Skipped if nothing was added or dropped; written to a temp file first so
+    an interrupted save never leaves a truncated cache.
+    """
+    entries = {key: hit for key, hit in _meta_cache.items() if key in _meta_cache_used or _is_current(key)}
+    if not _meta_cache_dirty and len(entries) == len(_meta_cache):
+        return
+    tmp = _META_CACHE_FILE.with_name(_META_CACHE_FILE.name + ".tmp")
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump({"version": _META_CACHE_VERSION, "entries": entries}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, _META_CACHE_FILE)
+    except OSError as e:
+        print(f"[warn] Could not save metadata cache '{_META_CACHE_FILE}': {e}")
+
+def _cached_src_metadata(src: Path) -> Tuple[Optional[Tuple[bytes, str]], Dict[str, Optional[str]]]:
+    """
+    _extract_src_metadata, memoized on disk by (path, mtime, size) so unchanged
+    sources are not re-parsed on later runs.
+    """
+    global _meta_cache_dirty
+    cache = _load_meta_cache()
+    st = os.stat(src)
+    key = (str(src), st.st_mtime_ns, st.st_size)
+    _meta_cache_used.add(key)
+    hit = cache.get(key)
+    if hit is not None:
+        cover, common = hit
+        return cover, dict(common)
+
+    cover, common = _extract_src_metadata(src)
+    cache[key] = (cover, dict(common))
+    _meta_cache_dirty = True
+    return cover, common
+
+# Tag headers (ID3v2 incl. artwork, MP4 atoms, FLAC blocks) usually sit in the first bytes
+_HEADER_PREFETCH_BYTES = 64 * 1024
+
+def _fadvise(path: Path, length: int, advice: int) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, length, advice)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _prefetch_headers(paths: Iterable[Path]) -> None:
+    """
+    Ask the kernel to start reading each file's header region in the background
+    (posix_fadvise WILLNEED), so later metadata parsing hits the page cache.
+    No-op where posix_fadvise is unavailable (e.g. Windows).
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in paths:
+        _fadvise(path, _HEADER_PREFETCH_BYTES, os.POSIX_FADV_WILLNEED)
+
+def _drop_from_page_cache(*paths: Path) -> None:
+    """
+    Tell the kernel we are done with these files (posix_fadvise DONTNEED) so finished
+    tracks don't evict sources that are still to be read. No-op where unsupported.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in paths:
+        _fadvise(path, 0, os.POSIX_FADV_DONTNEED)
+
 # ------------------ ID3 writing helpers ------------------
 
+# (common tag key, frame id, frame class) for the plain text frames, in write order
+_ID3_TEXT_FRAMES = (
+    ("album", "TALB", TALB),
+    ("artist", "TPE1", TPE1),
+    ("albumartist", "TPE2", TPE2),
+    ("genre", "TCON", TCON),
+    ("composer", "TCOM", TCOM),
+    ("date", "TYER", TYER),   # Year (ID3v2.3: TYER)
+    ("track", "TRCK", TRCK),  # Track / Disc numbers (text like "5/12")
+    ("disc", "TPOS", TPOS),
+)
+
 def _apply_common_id3_frames(id3_obj: ID3, common: Dict[str, Optional[str]], title: Optional[str], cover: Optional[Tuple[bytes, str]]):
     # Title
     if title:
         id3_obj.setall("TIT2", [TIT2(encoding=3, text=title)])
 
     # Common text frames
-    if common.get("album"):
-        id3_obj.setall("TALB", [TALB(encoding=3, text=common["album"])])
-    if common.get("artist"):
-        id3_obj.setall("TPE1", [TPE1(encoding=3, text=common["artist"])])
-    if common.get("albumartist"):
-        id3_obj.setall("TPE2", [TPE2(encoding=3, text=common["albumartist"])])
-    if common.get("genre"):
-        id3_obj.setall("TCON", [TCON(encoding=3, text=common["genre"])])
-    if common.get("composer"):
-        id3_obj.setall("TCOM", [TCOM(encoding=3, text=common["composer"])])
-
-    # Year (ID3v2.3: TYER)
-    if common.get("date"):
-        id3_obj.setall("TYER", [TYER(encoding=3, text=common["date"])])
-
-    # Track / Disc numbers (text like "5/12")
-    if common.get("track"):
-        id3_obj.setall("TRCK", [TRCK(encoding=3, text=common["track"])])
-    if common.get("disc"):
-        id3_obj.setall("TPOS", [TPOS(encoding=3, text=common["disc"])])
+    for key, frame_id, frame_cls in _ID3_TEXT_FRAMES:
+        value = common.get(key)
+        if value:
+            id3_obj.setall(frame_id, [frame_cls(encoding=3, text=value)])
 
     # Comment (use lang 'eng', desc empty)
     if common.get("comment"):
@@ -377,66 +627,141 @@ def _embed_all_aiff(dst_path: Path, title: Optional[str], cover: Optional[Tuple[
 
 # ------------------ ffmpeg converters ------------------
 
-def convert_to_mp3_320(ffmpeg: str, src: Path, dst: Path, title_for_tag: Optional[str]) -> int:
+# Per-output encoder settings, shared by the single-file and batched converters
+_MP3_ENCODERS = {"lame": "libmp3lame", "shine": "libshine"}  # shine is fixed-point/CBR only; fine for 320k CBR
+_AIFF_CODEC_ARGS = ("-c:a", "pcm_s24be", "-ar", "48000")  # always 24-bit big-endian, 48 kHz
+
+# CreateProcess rejects command lines longer than 32767 characters; keep some headroom
+_MAX_CMDLINE = 32000
+
+def _mp3_codec_args(encoder: str = "lame", threads: int = 0) -> Tuple[str, ...]:
+    return ("-threads", str(threads), "-c:a", _MP3_ENCODERS[encoder], "-b:a", "320k", "-id3v2_version", "3")
+
+@lru_cache(maxsize=None)
+def _ffprobe_path() -> Optional[str]:
+    return shutil.which("ffprobe")
+
+def _probe_audio_stream(src: Path) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (codec_name, sample_rate) of src's first audio stream via ffprobe, or (None, None)
+    if ffprobe is unavailable or fails.
+    """
+    ffprobe = _ffprobe_path()
+    if not ffprobe:
+        return None, None
+    cmd = [
+        ffprobe, "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "stream=codec_name,sample_rate", "-of", "csv=p=0", str(src),
+    ]
+    creationflags = getattr(subprocess, "CREATE_NO_WINDOW", 0) if os.name == "nt" else 0
+    proc = subprocess.run(
+        cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        creationflags=creationflags
+    )
+    fields = proc.stdout.decode("utf-8", errors="replace").strip().split(",")
+    if proc.returncode != 0 or len(fields) < 2:
+        return None, None
+    return fields[0], fields[1]
+
+def _aiff_codec_args(src: Path, threads: int = 0) -> Tuple[str, ...]:
+    """
+    Stream-copy sources that already are 24-bit big-endian PCM at 48 kHz (i.e. such AIFFs);
+    everything else is decoded and re-encoded.
+    """
+    if src.suffix.lower() in (".aif", ".aiff") and _probe_audio_stream(src) == ("pcm_s24be", "48000"):
+        return ("-c:a", "copy")
+    return ("-threads", str(threads), *_AIFF_CODEC_ARGS)
+
+def _run_ffmpeg(cmd: List[str], what: str, while_running: Optional[Callable[[], None]] = None) -> int:
+    """
+    Run ffmpeg and return its exit code. stdout is discarded and stderr is only
+    decoded (and printed) when the run fails.
+    `while_running` is called after ffmpeg has started, before waiting for it.
+    """
+    creationflags = getattr(subprocess, "CREATE_NO_WINDOW", 0) if os.name == "nt" else 0
+    proc = subprocess.Popen(
+        cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        creationflags=creationflags
+    )
+    try:
+        if while_running is not None:
+            while_running()
+    finally:
+        _, stderr = proc.communicate()
+    if proc.returncode != 0:
+        err = stderr.decode("utf-8", errors="replace")
+        print(f"[ffmpeg error] {what}:\n{err}")
+    return proc.returncode
+
+def convert_to_mp3_320(ffmpeg: str, src: Path, dst: Path, title_for_tag: Optional[str], encoder: str = "lame",
+                       threads: int = 0, while_running: Optional[Callable[[], None]] = None) -> int:
     """
-    Convert src to MP3 320kbps CBR at dst.
+    Convert src to MP3 320kbps CBR at dst, using libmp3lame ("lame") or libshine ("shine").
     We let ffmpeg copy container-level metadata, then enforce ID3 via mutagen.
     """
     dst.parent.mkdir(parents=True, exist_ok=True)
     cmd = [
         ffmpeg,
-        "-hide_banner", "-nostdin",
+        "-hide_banner", "-nostdin", "-nostats",
         "-loglevel", "error",
         "-y",
         "-i", str(src),
-        "-vn",
-        "-c:a", "libmp3lame",
-        "-b:a", "320k",
-        "-map_metadata", "0",
-        "-id3v2_version", "3",
+        "-map", "0:a:0",  # primary audio stream only; artwork is re-embedded by mutagen
+        *_mp3_codec_args(encoder, threads),
+        "-map_metadata", "0:g",
     ]
     if title_for_tag:
         cmd += ["-metadata", f"title={title_for_tag}"]
     cmd += [str(dst)]
 
-    creationflags = getattr(subprocess, "CREATE_NO_WINDOW", 0) if os.name == "nt" else 0
-    proc = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-        text=True, encoding="utf-8", errors="replace", creationflags=creationflags
-    )
-    if proc.returncode != 0:
-        print(f"[ffmpeg error] converting '{src}':\n{proc.stdout}")
-    return proc.returncode
+    return _run_ffmpeg(cmd, f"converting '{src}'", while_running)
 
-def convert_to_aiff_pcm_24bit(ffmpeg: str, src: Path, dst: Path, title_for_tag: Optional[str]) -> int:
+def convert_to_aiff_pcm_24bit(ffmpeg: str, src: Path, dst: Path, title_for_tag: Optional[str],
+                              threads: int = 0, while_running: Optional[Callable[[], None]] = None) -> int:
     """
-    Convert src to uncompressed AIFF at 24-bit PCM (pcm_s24be) and 48 kHz at dst.
+    Convert src to uncompressed AIFF at 24-bit PCM (pcm_s24be) and 48 kHz at dst
+    (a plain stream copy when src already is exactly that).
     We do NOT try to write ID3 in ffmpeg; mutagen will write a proper ID3 chunk.
     """
     dst.parent.mkdir(parents=True, exist_ok=True)
     cmd = [
         ffmpeg,
-        "-hide_banner", "-nostdin",
+        "-hide_banner", "-nostdin", "-nostats",
         "-loglevel", "error",
         "-y",
         "-i", str(src),
-        "-vn",
-        "-c:a", "pcm_s24be",   # always 24-bit big-endian
-        "-ar", "48000",        # force 48 kHz sample rate
-        "-map_metadata", "0",  # harmless; AIFF ID3 will be handled by mutagen
+        "-map", "0:a:0",  # primary audio stream only
+        *_aiff_codec_args(src, threads),
+        # no -map_metadata: the AIFF ID3 chunk is written by mutagen afterwards
     ]
     if title_for_tag:
         cmd += ["-metadata", f"title={title_for_tag}"]
     cmd += [str(dst)]
 
-    creationflags = getattr(subprocess, "CREATE_NO_WINDOW", 0) if os.name == "nt" else 0
-    proc = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-        text=True, encoding="utf-8", errors="replace", creationflags=creationflags
-    )
-    if proc.returncode != 0:
-        print(f"[ffmpeg error] converting '{src}':\n{proc.stdout}")
-    return proc.returncode
+    return _run_ffmpeg(cmd, f"converting '{src}'", while_running)
+
+def convert_batch(ffmpeg: str, jobs, codec_args: Callable[[Path], Tuple[str, ...]], map_metadata: bool,
+                  while_running: Optional[Callable[[], None]] = None) -> int:
+    """
+    Convert several (src, dst, title) jobs with a single ffmpeg process, one output per input.
+    `map_metadata` copies each input's global metadata to its output (as the MP3 converter does).
+    Returns -1 without running anything if the command line would be too long.
+    """
+    cmd = [ffmpeg, "-hide_banner", "-nostdin", "-nostats", "-loglevel", "error", "-y"]
+    for src, _, _ in jobs:
+        cmd += ["-i", str(src)]
+    for i, (src, dst, title_for_tag) in enumerate(jobs):
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        cmd += ["-map", f"{i}:a:0", *codec_args(src)]
+        if map_metadata:
+            cmd += ["-map_metadata", f"{i}:g"]
+        if title_for_tag:
+            cmd += ["-metadata", f"title={title_for_tag}"]
+        cmd.append(str(dst))
+    if len(subprocess.list2cmdline(cmd)) > _MAX_CMDLINE:
+        return -1
+
+    return _run_ffmpeg(cmd, f"batch of {len(jobs)} tracks (retrying one by one)", while_running)
 
 
 # ------------------ Main ------------------
@@ -450,6 +775,44 @@ def main():
         default="aiff",
         help="Output audio format. 'aiff' (24-bit uncompressed) or 'mp3' (320kbps CBR). Default: aiff",
     )
+    parser.add_argument(
+        "--mp3-encoder",
+        choices=sorted(_MP3_ENCODERS),
+        default="lame",
+        help="MP3 encoder. 'shine' is faster but needs an ffmpeg built with libshine. Default: lame",
+    )
+    parser.add_argument(
+        "--skip-existing",
+        action="store_true",
+        help="Keep the output folder and skip tracks whose output file already exists.",
+    )
+    parser.add_argument(
+        "--skip-if-newer",
+        action="store_true",
+        help="Keep the output folder and skip tracks whose output is newer than the source; "
+             "re-convert the others in place.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Number of tracks converted in parallel. Default: number of CPU cores",
+    )
+    parser.add_argument(
+        "--ffmpeg-threads",
+        type=int,
+        default=0,
+        metavar="K",
+        help="Threads per ffmpeg process (0 = let ffmpeg decide). Keep jobs*K near the core count. Default: 0",
+    )
+    parser.add_argument(
+        "--ffmpeg-batch",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Convert up to N tracks per ffmpeg process to save process start-up cost. Default: 1",
+    )
     args = parser.parse_args()
 
     ffmpeg = ensure_ffmpeg()
@@ -466,8 +829,9 @@ def main():
     fmt_suffix = "aiff" if args.format == "aiff" else "mp3_320"
     out_dir = script_dir / f"{args.playlist}_{fmt_suffix}"
 
-    # --- Remove existing output folder if it exists ---
-    if out_dir.exists():
+    # --- Remove existing output folder if it exists (unless re-running incrementally) ---
+    incremental = args.skip_existing or args.skip_if_newer
+    if out_dir.exists() and not incremental:
         print(f"[info] Removing existing output folder: {out_dir}")
         shutil.rmtree(out_dir)
 
@@ -476,14 +840,27 @@ def main():
 
     converted = 0
     skipped = 0
+    up_to_date = 0
     failures = 0
 
-    for song in songs:
+    # Resolve sources and reserve destination names up front (in TrackNo order)
+    # Names are numbered as in a fresh run; with --skip-* they may match last run's files
+    on_disk = {os.path.normcase(e.name) for e in os.scandir(out_dir)}
+    old_sources = _load_sources_manifest(out_dir) if incremental else {}
+    sources: Dict[str, str] = {}
+    claimed: Set[str] = set()
+    jobs = []
+    report = io.StringIO()  # written to stdout every 32 tracks instead of per line
+    for n, song in enumerate(songs, 1):
+        if n % 32 == 0:
+            sys.stdout.write(report.getvalue())
+            report.seek(0)
+            report.truncate()
         content = song.Content
         src_path_str = guess_content_file_path(content)
         title = getattr(content, "Title", "(unknown title)")
-        if not src_path_str or not os.path.isfile(src_path_str):
-            print(f"[skip] Track #{song.TrackNo}: '{title}' – source path not found or missing on disk.")
+        if not src_path_str or not _isfile(src_path_str):
+            report.write(f"[skip] Track #{song.TrackNo}: '{title}' – source path not found or missing on disk.\n")
             skipped += 1
             continue
 
@@ -497,39 +874,93 @@ def main():
             dst_name = f"{src.stem}_mp3_320.mp3"
             transcoded_title = f"{title} (320 mp3)"
 
-        dst = unique_with_counter(out_dir / dst_name)
-
-        print(f"[convert] Track #{song.TrackNo}: '{title}'")
-        print(f"    src: {src}")
-        print(f"    dst: {dst}")
-
-        # Convert
-        if args.format == "aiff":
-            rc = convert_to_aiff_pcm_24bit(ffmpeg, src, dst, transcoded_title)
+        dst = unique_with_counter(out_dir / dst_name, claimed)
+        dst_key = os.path.normcase(dst.name)
+        # A numbered name may now belong to another same-stem track: only trust files from this source
+        if dst_key in on_disk and old_sources.get(dst_key) == str(src):
+            if args.skip_existing or dst.stat().st_mtime >= src.stat().st_mtime:
+                report.write(f"[up-to-date] Track #{song.TrackNo}: '{title}'\n")
+                sources[dst_key] = str(src)
+                up_to_date += 1
+                continue
+            # Source changed since the last run: re-convert over the old output
+
+        report.write(f"[convert] Track #{song.TrackNo}: '{title}'\n    src: {src}\n    dst: {dst}\n")
+        jobs.append((src, dst, transcoded_title))
+    sys.stdout.write(report.getvalue())
+
+    if args.format == "aiff":
+        convert = partial(convert_to_aiff_pcm_24bit, threads=args.ffmpeg_threads)
+        codec_args = partial(_aiff_codec_args, threads=args.ffmpeg_threads)
+        embed = _embed_all_aiff
+    else:
+        convert = partial(convert_to_mp3_320, encoder=args.mp3_encoder, threads=args.ffmpeg_threads)
+        mp3_args = _mp3_codec_args(args.mp3_encoder, args.ffmpeg_threads)
+        codec_args = lambda _src: mp3_args
+        embed = _embed_all_mp3
+
+    def process(shard) -> List[bool]:
+        # Source artwork/tags are parsed while ffmpeg runs, then embedded once it is done
+        metadata = {}
+
+        def read_metadata(jobs):
+            def read():
+                for src, _, _ in jobs:
+                    if src in metadata:
+                        continue
+                    # A corrupt source must not take the rest of the run down with it
+                    try:
+                        metadata[src] = _cached_src_metadata(src)
+                    except (MutagenError, OSError) as e:
+                        print(f"[warn] Could not read tags from '{src.name}': {e}")
+                        metadata[src] = (None, {})
+            return read
+
+        # One ffmpeg for the whole shard; if that fails, convert each file on its own
+        if len(shard) > 1 and convert_batch(ffmpeg, shard, codec_args, args.format == "mp3", read_metadata(shard)) == 0:
+            oks = [True] * len(shard)
         else:
-            rc = convert_to_mp3_320(ffmpeg, src, dst, transcoded_title)
+            oks = [convert(ffmpeg, *job, while_running=read_metadata([job])) == 0 for job in shard]
 
-        if rc == 0:
+        for (src, dst, transcoded_title), ok in zip(shard, oks):
+            if not ok:
+                continue
             # After conversion, embed artwork + full tag set for reliability
-            cover = _get_cover_from_src(src)
-            common = _read_common_tags(src)
+            cover, common = metadata[src]
             try:
-                if args.format == "aiff":
-                    _embed_all_aiff(dst, transcoded_title, cover, common)
-                else:
-                    _embed_all_mp3(dst, transcoded_title, cover, common)
+                embed(dst, transcoded_title, cover, common)
             except Exception as e:
                 print(f"[warn] Could not embed tags on '{dst.name}': {e}")
-            converted += 1
-        else:
+            _drop_from_page_cache(src, dst)
+        return oks
+
+    _prefetch_headers(src for src, _, _ in jobs)
+
+    # Run the whole per-track pipeline in parallel; ffmpeg runs out-of-process,
+    # so threads keep every core busy
+    batch = max(1, args.ffmpeg_batch)
+    shards = [jobs[i:i + batch] for i in range(0, len(jobs), batch)]
+    with ThreadPoolExecutor(max_workers=args.jobs or os.cpu_count()) as ex:
+        results = [ok for oks in ex.map(process, shards) for ok in oks]
+
+    # Maintain file order for easy drag/drop sorting: stamp increasing mtimes
+    # in TrackNo order instead of waiting between conversions.
+    base_ts = time.time() - len(jobs)
+    for i, ((src, dst, _), ok) in enumerate(zip(jobs, results)):
+        if not ok:
             failures += 1
-
-        # Maintain file creation order for easy drag/drop sorting
-        time.sleep(2)
+            continue
+        os.utime(dst, (base_ts + i, base_ts + i))
+        _set_creation_time(dst, base_ts + i)
+        converted += 1
+        sources[os.path.normcase(dst.name)] = str(src)
+    _save_sources_manifest(out_dir, sources)
 
     print("\n=== Summary ===")
     print(f"Converted: {converted}")
     print(f"Skipped (no source): {skipped}")
+    if incremental:
+        print(f"Skipped (up to date): {up_to_date}")
     print(f"Failures: {failures}")
     print(f"Output: {out_dir}")
 
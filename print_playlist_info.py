@@ -12,6 +12,7 @@
 # ---------------------------------------------------------------------------
 
 import argparse
+import sys
 from RekordboxPlaylistAnalyzer import RekordboxPlaylistAnalyzer
 
 
@@ -32,7 +33,7 @@ def main() -> None:
     args = parser.parse_args()
 
     analyzer = RekordboxPlaylistAnalyzer()
-    print(analyzer.analyze_playlist(args.playlist, max_songs=args.max_songs))
+    analyzer.analyze_playlist(args.playlist, max_songs=args.max_songs, out=sys.stdout)
 
 
 if __name__ == "__main__":
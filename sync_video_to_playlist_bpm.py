@@ -14,20 +14,14 @@
 #   --jump-interval   Optional. If set, jumps to a random video position every X seconds.
 
 import argparse
-import random
+import logging
 import time
-from datetime import datetime
-import os
 
 from RekordboxPlaylistAnalyzer import RekordboxPlaylistAnalyzer
-vlc = RekordboxPlaylistAnalyzer.load_vlc_module()
+from video_playback import (configure_logging, jump_to_random_position, start_and_wait_for_length,
+                            stop_event_for, wait_for_stop)
 
-
-def jump_to_random_position(player, length_s: float):
-    if length_s > 0:
-        new_pos = random.uniform(0, length_s)
-        player.set_time(int(new_pos * 1000))
-        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Jumping to {new_pos:.1f}s of {length_s:.1f}s")
+logger = logging.getLogger(__name__)
 
 
 def main():
@@ -42,6 +36,7 @@ def main():
     parser.add_argument("--jump-interval", type=int, default=None, help="If set, skip to a random part of the video every X seconds")
 
     args = parser.parse_args()
+    configure_logging()
 
     # Print config at start
     print("\n--- Script Configuration ---")
@@ -52,7 +47,7 @@ def main():
     analyzer = RekordboxPlaylistAnalyzer()
     base_bpm = analyzer.get_base_bpm(args.playlist, average=args.average_bpm)
     mode = "average" if args.average_bpm else "first track"
-    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Base BPM ({mode}): {base_bpm:.2f}")
+    logger.info("Base BPM (%s): %.2f", mode, base_bpm)
 
     if args.max_playback_rate:
 
@@ -60,24 +55,27 @@ def main():
         if args.max_playback_rate < 1.0:
             raise ValueError("max_playback_rate must be 1.0 or greater")
 
-        bpms = [
-            analyzer.rekordbox_bpm_to_bpm(s.Content.BPM)
-            for s in analyzer.get_playlist_songs_by_trackno(args.playlist)
-        ]
-        min_bpm = min(bpms)
-        max_bpm = max(bpms)
-        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] "
-              f"Dynamic scaling enabled: Min BPM in this playlist is {min_bpm:.2f}, Max BPM is {max_bpm:.2f} BPM. "
-              f"Max playback rate: {args.max_playback_rate:.2f}x")
+        bpms = analyzer.get_playlist_bpms(args.playlist)
+        min_bpm, max_bpm = float(bpms.min()), float(bpms.max())
+        # Linear map base_bpm → 1.0x, max_bpm → max_playback_rate, as rate = bpm * slope + intercept
+        # (flat 1.0x if the playlist's max BPM is the base BPM)
+        span = max_bpm - base_bpm
+        slope = (args.max_playback_rate - 1.0) / span if span else 0.0
+        intercept = 1.0 - base_bpm * slope
+        logger.info(
+            "Dynamic scaling enabled: Min BPM in this playlist is %.2f, Max BPM is %.2f BPM. "
+            "Max playback rate: %.2fx", min_bpm, max_bpm, args.max_playback_rate
+        )
     else:
         min_bpm = base_bpm
         max_bpm = base_bpm
-        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] "
-              f"Static scaling: 1.0x for {base_bpm:.2f} BPM, adjusting rate based on how many "
-              f"X faster or slower the current song is compared to this base BPM.")
+        logger.info(
+            "Static scaling: 1.0x for %.2f BPM, adjusting rate based on how many "
+            "X faster or slower the current song is compared to this base BPM.", base_bpm
+        )
 
     # Set up VLC player
-    instance = vlc.Instance('--vout=opengl')
+    instance = RekordboxPlaylistAnalyzer.get_vlc_instance()
 
     player = instance.media_player_new()
     media = instance.media_new(str(args.video))
@@ -86,48 +84,61 @@ def main():
     media.add_option("input-repeat=999999")
 
     player.set_media(media)
-    player.play()
-
-    # Give VLC some time to load the media
-    time.sleep(0.5)
-    length_ms = player.get_length()
-    length_s = length_ms / 1000.0 if length_ms > 0 else 0.0
+    length_s = start_and_wait_for_length(player)
 
     jump_to_random_position(player, length_s)
 
     # Initialize play-count tracking
     prev_counts = analyzer.init_play_counts(args.playlist)
     last_known_song = None
-    last_jump_time = time.time()
+    last_mult = None
+    now = time.monotonic()
+    next_check = now + args.interval
+    next_jump = now + args.jump_interval if args.jump_interval else None
 
-    # Main loop
+    # Ctrl+C or the end of the video sets stop_event, which wakes the main loop at once
+    stop_event = stop_event_for(player)
+
+    # Main loop: sleep until the next jump or BPM check is due instead of polling
     while True:
-        time.sleep(args.interval)
+        due = min(t for t in (next_check, next_jump) if t is not None)
+        if wait_for_stop(stop_event, due - time.monotonic()):
+            break
 
-        now = time.time()
-        if args.jump_interval and (now - last_jump_time >= args.jump_interval):
+        now = time.monotonic()
+        if next_jump is not None and now >= next_jump:
             jump_to_random_position(player, length_s)
-            last_jump_time = now
+            next_jump = now + args.jump_interval
+
+        if now < next_check:
+            continue
+        next_check = now + args.interval
 
         current, prev_counts = analyzer.detect_current_song(args.playlist, prev_counts, last_known_song)
         last_known_song = current
 
-        curr_bpm = analyzer.rekordbox_bpm_to_bpm(current.Content.BPM)
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        curr_bpm = current.bpm
 
         if args.max_playback_rate:
-            mult = 1.0 + ((curr_bpm - base_bpm) / (max_bpm - base_bpm)) * (args.max_playback_rate - 1.0)
+            mult = curr_bpm * slope + intercept
         else:
             mult = analyzer.get_bpm_multiplier(curr_bpm, base_bpm)
 
-        print(
-            f"[{timestamp}] "
-            f"Song #{current.TrackNo} – \"{current.Content.Title}\" | "
-            f"Current BPM: {curr_bpm:.2f} | Base BPM based on {mode}: {base_bpm:.2f} | Playback rate: {mult:.2f}x | "
-            f"Max playback rate: {round(args.max_playback_rate, 2) if args.max_playback_rate else 'N/A'}"
+        logger.info(
+            "Song #%s – \"%s\" | Current BPM: %.2f | Base BPM based on %s: %.2f | Playback rate: %.2fx | "
+            "Max playback rate: %s",
+            current.track_no, current.title, curr_bpm, mode, base_bpm, mult,
+            round(args.max_playback_rate, 2) if args.max_playback_rate else "N/A",
         )
 
-        player.set_rate(mult)
+        # Only cross into libVLC when the rate actually changes. Checks are --interval
+        # apart and detect_current_song keeps the last song while play counts are
+        # unchanged, so the check interval already coalesces changes
+        if last_mult is None or abs(mult - last_mult) > 1e-3:
+            player.set_rate(mult)
+            last_mult = mult
+
+    player.stop()
 
 
 if __name__ == "__main__":
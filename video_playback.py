@@ -0,0 +1,146 @@
+# video_playback.py
+# -----------------
+# libVLC playback helpers shared by sync_video_to_playlist_bpm.py,
+# video_player.py and video_player_with_effects.py. watch_playlist_playing.py
+# uses only the stop-event helpers.
+#
+# This is meant to be imported; you do not run this directly.
+#
+# python-vlc is imported inside the helpers rather than at module level:
+# sync_video_to_playlist_bpm.py loads it through
+# RekordboxPlaylistAnalyzer.load_vlc_module(), and by the time a player
+# exists the module is already in sys.modules.
+
+import logging
+import random
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Random jumps land on multiples of this many ms; VLC seeks to a nearby
+# keyframe anyway, so finer positions buy nothing
+JUMP_STEP_MS = 2000
+
+# Our own generator rather than the random module's shared one
+_RNG = random.Random()
+
+# Longest single Event.wait in the main loops: on Windows (before Python 3.14)
+# it can't be interrupted, and the SIGINT handler only runs once it returns
+STOP_POLL_S = 0.5
+
+
+LOG_FORMAT = "[%(asctime)s] %(message)s"
+LOG_DATEFMT = "%Y-%m-%d %H:%M:%S"
+
+
+@lru_cache(maxsize=2)
+def _fmt_ts(sec: int) -> str:
+    return datetime.fromtimestamp(sec).strftime(LOG_DATEFMT)
+
+
+class _PerSecondFormatter(logging.Formatter):
+    """LOG_FORMAT formatter that renders each second's timestamp only once."""
+
+    def formatTime(self, record, datefmt=None):
+        return _fmt_ts(int(record.created))
+
+
+def configure_logging(level: int = logging.INFO):
+    """Log to stdout as "[YYYY-mm-dd HH:MM:SS] message"; call once from main()."""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(_PerSecondFormatter(LOG_FORMAT))
+    logging.basicConfig(level=level, handlers=[handler])
+
+
+def jump_to_random_position(player, length_s: float, step_ms: int = JUMP_STEP_MS):
+    """Jump to a random position in the video, on a step_ms grid."""
+    length_ms = int(length_s * 1000)
+    if length_ms > 0:
+        new_ms = _RNG.randrange(0, length_ms, step_ms)
+        player.set_time(new_ms)
+        logger.info("Jumping to %.1fs of %.1fs", new_ms / 1000, length_s)
+
+
+def start_and_wait_for_length(player, timeout: float = 5.0) -> float:
+    """
+    Start playback and return the media length in seconds (0.0 if still unknown after `timeout`).
+    The media is parsed in the background while playback starts; whichever of its
+    MediaParsedChanged or the player's MediaPlayerLengthChanged comes first wakes
+    us, instead of sleeping a fixed time.
+    """
+    import vlc
+
+    length_ms = []
+    woke = threading.Event()
+
+    def on_length_changed(event):
+        # Runs on a libVLC thread: only record the value, never call back into libVLC here
+        if event.u.new_length > 0:
+            length_ms.append(event.u.new_length)
+            woke.set()
+
+    def on_parsed(event):
+        # Same here: the duration is read back on our own thread
+        woke.set()
+
+    media = player.get_media()
+    events = player.event_manager()
+    media_events = media.event_manager()
+    events.event_attach(vlc.EventType.MediaPlayerLengthChanged, on_length_changed)
+    media_events.event_attach(vlc.EventType.MediaParsedChanged, on_parsed)
+    media.parse_with_options(vlc.MediaParseFlag.local, -1)
+    player.play()
+
+    deadline = time.monotonic() + timeout
+    while True:
+        woke.wait(max(0.0, deadline - time.monotonic()))
+        woke.clear()
+        ms = length_ms[-1] if length_ms else media.get_duration()
+        if ms > 0 or time.monotonic() >= deadline:
+            break
+
+    events.event_detach(vlc.EventType.MediaPlayerLengthChanged)
+    media_events.event_detach(vlc.EventType.MediaParsedChanged)
+
+    if ms <= 0:
+        ms = player.get_length()
+    return ms / 1000.0 if ms > 0 else 0.0
+
+
+def stop_event_on_sigint() -> threading.Event:
+    """
+    Return an Event that Ctrl+C sets, so a main loop waiting on it wakes at once.
+    Installs the SIGINT handler; call it right before the loop so Ctrl+C during
+    setup still raises KeyboardInterrupt.
+    """
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    return stop_event
+
+
+def stop_event_for(player) -> threading.Event:
+    """stop_event_on_sigint(), also set when the player reaches the end of the video."""
+    import vlc
+
+    stop_event = stop_event_on_sigint()
+    player.event_manager().event_attach(vlc.EventType.MediaPlayerEndReached, lambda event: stop_event.set())
+    return stop_event
+
+
+def wait_for_stop(stop_event: threading.Event, timeout: float) -> bool:
+    """
+    Wait up to `timeout` seconds for stop_event; True if it was set.
+    Waits in slices of at most STOP_POLL_S so Ctrl+C is handled promptly on Windows.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        left = deadline - time.monotonic()
+        if left <= 0:
+            return stop_event.is_set()
+        if stop_event.wait(min(STOP_POLL_S, left)):
+            return True
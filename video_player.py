@@ -6,18 +6,14 @@
 #   python simple_video_player.py --video "C:/path/to/video.mp4" --rate 1.25 [--jump-interval 30]
 
 import argparse
-import random
+import logging
 import time
-from datetime import datetime
 import vlc
 
+from video_playback import (configure_logging, jump_to_random_position, start_and_wait_for_length,
+                            stop_event_for, wait_for_stop)
 
-def jump_to_random_position(player, length_s: float):
-    """Jump to a random position in the video."""
-    if length_s > 0:
-        new_pos = random.uniform(0, length_s)
-        player.set_time(int(new_pos * 1000))
-        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Jumping to {new_pos:.1f}s of {length_s:.1f}s")
+logger = logging.getLogger(__name__)
 
 
 def main():
@@ -27,6 +23,7 @@ def main():
     parser.add_argument("--jump-interval", type=int, default=None,
                         help="If set, jump to a random part of the video every X seconds")
     args = parser.parse_args()
+    configure_logging()
 
     if args.rate <= 0:
         raise ValueError("Playback rate must be greater than 0.")
@@ -42,28 +39,28 @@ def main():
     media = instance.media_new(str(args.video))
     media.add_option("input-repeat=999999")  # Loop indefinitely
     player.set_media(media)
-    player.play()
-
-    # Give VLC time to start
-    time.sleep(0.5)
-
-    length_ms = player.get_length()
-    length_s = length_ms / 1000.0 if length_ms > 0 else 0.0
+    length_s = start_and_wait_for_length(player)
 
     # Apply playback rate
     player.set_rate(args.rate)
-    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Playback rate set to {args.rate:.2f}x")
+    logger.info("Playback rate set to %.2fx", args.rate)
 
-    last_jump_time = time.time()
+    # Ctrl+C or the end of the video sets stop_event, which wakes the main loop at once
+    stop_event = stop_event_for(player)
 
-    # Main loop
+    # Main loop: sleep until the next jump is due instead of polling
+    next_jump = time.monotonic() + args.jump_interval if args.jump_interval else None
     while True:
-        time.sleep(0.5)
-        now = time.time()
+        timeout = max(0.0, next_jump - time.monotonic()) if next_jump is not None else 60.0
+        if wait_for_stop(stop_event, timeout):
+            break
 
-        if args.jump_interval and (now - last_jump_time >= args.jump_interval):
+        now = time.monotonic()
+        if next_jump is not None and now >= next_jump:
             jump_to_random_position(player, length_s)
-            last_jump_time = now
+            next_jump = now + args.jump_interval
+
+    player.stop()
 
 
 if __name__ == "__main__":
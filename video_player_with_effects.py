@@ -15,29 +15,35 @@
 #   --hue-min -120 --hue-max 120
 
 import argparse
-import random
+import logging
 import time
-from datetime import datetime
+from typing import Optional
 import vlc
 
+from video_playback import (configure_logging, jump_to_random_position, start_and_wait_for_length,
+                            stop_event_for, wait_for_stop)
+
+logger = logging.getLogger(__name__)
 
-def obs_to_vlc_hue(obs_deg: int) -> int:
-    """Map OBS hue (-180..180) to VLC hue (0..360)."""
-    return int((obs_deg + 360) % 360)
 
+# OBS hue (-180..180) → VLC hue (0..360), indexed by obs_deg + 180
+_OBS_TO_VLC = tuple((d + 360) % 360 for d in range(-180, 181))
 
-def set_vlc_hue(player: vlc.MediaPlayer, obs_deg: int):
-    """Enable adjust filter (if not already) and set hue."""
-    player.video_set_adjust_int(vlc.VideoAdjustOption.Enable, 1)
-    player.video_set_adjust_int(vlc.VideoAdjustOption.Hue, obs_to_vlc_hue(obs_deg))
+
+def obs_to_vlc_hue(obs_deg: int) -> int:
+    """Map OBS hue (-180..180) to VLC hue (0..360)."""
+    return _OBS_TO_VLC[obs_deg + 180]
 
 
-def jump_to_random_position(player, length_s: float):
-    """Jump to a random position in the video."""
-    if length_s > 0:
-        new_pos = random.uniform(0, length_s)
-        player.set_time(int(new_pos * 1000))
-        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Jumping to {new_pos:.1f}s of {length_s:.1f}s")
+def set_vlc_hue(player: vlc.MediaPlayer, obs_deg: int, last_hue: Optional[int] = None) -> int:
+    """
+    Set hue and return the VLC hue applied; nothing is sent to VLC if it is
+    unchanged. The adjust filter must already be enabled.
+    """
+    hue = _OBS_TO_VLC[obs_deg + 180]
+    if hue != last_hue:
+        player.video_set_adjust_int(vlc.VideoAdjustOption.Hue, hue)
+    return hue
 
 
 def main():
@@ -63,6 +69,7 @@ def main():
                         help="Maximum hue (OBS scale, default: 180)")
 
     args = parser.parse_args()
+    configure_logging()
 
     if args.rate <= 0:
         raise ValueError("Playback rate must be greater than 0.")
@@ -80,51 +87,54 @@ def main():
     media = instance.media_new(str(args.video))
     media.add_option("input-repeat=999999")  # Loop indefinitely
     player.set_media(media)
-    player.play()
-
-    # Give VLC time to start
-    time.sleep(0.5)
-
-    length_ms = player.get_length()
-    length_s = length_ms / 1000.0 if length_ms and length_ms > 0 else 0.0
+    length_s = start_and_wait_for_length(player)
 
     # Apply playback rate
     player.set_rate(args.rate)
-    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Playback rate set to {args.rate:.2f}x")
+    logger.info("Playback rate set to %.2fx", args.rate)
 
     # Initialize hue oscillation
     next_hue = args.hue_min
     direction = +1  # +1 means next flip goes to hue_max; -1 goes to hue_min
+    last_hue = None
     if args.hue_oscillate:
-        # Enable adjust and set initial hue
-        set_vlc_hue(player, next_hue)
-        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Hue set to {next_hue}° (OBS scale)")
-    last_hue_flip = time.time()
-
-    last_jump_time = time.time()
-
-    # Main loop
+        # Enable adjust once and set initial hue
+        player.video_set_adjust_int(vlc.VideoAdjustOption.Enable, 1)
+        last_hue = set_vlc_hue(player, next_hue)
+        logger.info("Hue set to %d° (OBS scale)", next_hue)
+    now = time.monotonic()
+    next_hue_flip = now + args.hue_interval if args.hue_oscillate else None
+    next_jump = now + args.jump_interval if args.jump_interval else None
+
+    # Ctrl+C or the end of the video sets stop_event, which wakes the main loop at once
+    stop_event = stop_event_for(player)
+
+    # Main loop: sleep until the next jump or hue flip is due instead of polling
     while True:
-        time.sleep(0.1)
-        now = time.time()
+        due = [t for t in (next_jump, next_hue_flip) if t is not None]
+        if wait_for_stop(stop_event, min(due) - time.monotonic() if due else 60.0):
+            break
+        now = time.monotonic()
 
         # Random jump logic
-        if args.jump_interval and (now - last_jump_time >= args.jump_interval):
+        if next_jump is not None and now >= next_jump:
             jump_to_random_position(player, length_s)
-            last_jump_time = now
+            next_jump = now + args.jump_interval
 
         # Hue oscillation logic
-        if args.hue_oscillate and (now - last_hue_flip >= args.hue_interval):
+        if next_hue_flip is not None and now >= next_hue_flip:
             # Flip to the other endpoint
             if direction > 0:
                 next_hue = args.hue_max
             else:
                 next_hue = args.hue_min
 
-            set_vlc_hue(player, next_hue)
-            print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Hue set to {next_hue}° (OBS scale)")
+            last_hue = set_vlc_hue(player, next_hue, last_hue)
+            logger.info("Hue set to %d° (OBS scale)", next_hue)
             direction *= -1
-            last_hue_flip = now
+            next_hue_flip = now + args.hue_interval
+
+    player.stop()
 
 
 if __name__ == "__main__":
@@ -15,8 +15,8 @@
 #       --interval 15
 
 import argparse
-import time
 from RekordboxPlaylistAnalyzer import RekordboxPlaylistAnalyzer
+from video_playback import stop_event_on_sigint, wait_for_stop
 
 def main():
     parser = argparse.ArgumentParser(
@@ -40,6 +40,8 @@ def main():
         return
 
     last_known_song = None
+    # Ctrl+C sets stop_event, which wakes the loop at once instead of after the interval
+    stop_event = stop_event_on_sigint()
     print(f"Monitoring '{args.playlist}' every {args.interval}s…")
 
     while True:
@@ -48,13 +50,13 @@ def main():
         )
         last_known_song = current
 
-        bpm = analyzer.rekordbox_bpm_to_bpm(current.Content.BPM)
         print(
             f"→ Now playing: "
-            f"#{current.TrackNo} – {current.Content.Title} "
-            f"({bpm:.2f} BPM)"
+            f"#{current.track_no} – {current.title} "
+            f"({current.bpm:.2f} BPM)"
         )
-        time.sleep(args.interval)
+        if wait_for_stop(stop_event, args.interval):
+            break
 
 if __name__ == "__main__":
     main()